@@ -0,0 +1,199 @@
+"""Times TimeIt's hot paths for different numbers of rows, and writes the results as JSON.
+
+    python benchmarks.py [--sizes 10,100,1000,5000] [--repeats 20] [--output benchmarks.json] [--engine-only]
+
+The UI benchmarks build a real `Boxes` without ever showing it, so they need Kivy and a display (on a
+headless machine, run this under `xvfb-run`). `--engine-only` skips them, and only needs the stdlib.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import typing
+
+DEFAULT_SIZES = (10, 100, 1000, 5000)
+DEFAULT_REPEATS = 20
+DRAG_SWEEP_STEPS = 50
+MOVE_ROW_STEPS = 100
+
+
+def measure(func: typing.Callable[[], None], repeats) -> typing.Dict[str, float]:
+    """Calls `func` `repeats` times (after one untimed warm up call) and summarizes the times, in microseconds."""
+    func()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return {
+        'repeats': repeats,
+        'min_us': min(samples),
+        'median_us': statistics.median(samples),
+        'mean_us': statistics.mean(samples),
+        'max_us': max(samples),
+    }
+
+
+def bench_engine(n, repeats, tmp_dir):
+    from engine import TimerEngine
+    from persistence import write_json_atomic
+
+    engine = TimerEngine()
+    for i in range(n):
+        engine.add_row(text=f"Activity {i}")
+    engine.start(engine.row_ordering[n // 2])
+
+    blob = engine.to_json()
+    filepath = os.path.join(tmp_dir, f"engine_{n}.json")
+
+    def load():
+        TimerEngine().from_json(blob)
+
+    def move_rows():
+        # move the bottom row to just below the top one, over and over, so every move lands in the same spot
+        for _ in range(MOVE_ROW_STEPS):
+            engine.move_row(engine.row_ordering[-1], 1)
+
+    def add_remove_row():
+        engine.remove_row(engine.add_row().row_id)
+
+    return {
+        'engine.tick': measure(engine.tick, repeats),
+        'engine.to_json': measure(engine.to_json, repeats),
+        'engine.from_json': measure(load, repeats),
+        'engine.move_row (same spot, x100)': measure(move_rows, repeats),
+        'engine.add_row + remove_row': measure(add_remove_row, repeats),
+        'engine.save': measure(lambda: write_json_atomic(filepath, engine.to_json()), repeats),
+    }, {}
+
+
+def bench_ui(n, repeats, tmp_dir):
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
+    os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+    from kivy.clock import Clock
+    from kivy.core.window import Window
+    import timeit as app
+
+    parent = types.SimpleNamespace(title="")
+    boxes = app.Boxes(parent, num_default_rows=n)
+    Window.add_widget(boxes)
+    for _ in range(3):
+        Clock.tick()  # lets the layout settle
+    boxes._refresh_visible_rows()
+    boxes.engine.start(boxes.row_ordering[0])
+
+    filepath = os.path.join(tmp_dir, f"ui_{n}.json")
+    blob = boxes.to_json()
+
+    def mouse_move():
+        app.hover_dispatcher._handle_mouse_move(Window, (Window.width / 2, Window.height / 2))
+
+    def drag_sweep():
+        # pick up the first row and drag it all the way down the window and back up again
+        boxes.floating_row = boxes.row_ordering[0]
+        for step in list(range(DRAG_SWEEP_STEPS)) + list(range(DRAG_SWEEP_STEPS, -1, -1)):
+            boxes.update_floating_row((0.5, 1 - step / DRAG_SWEEP_STEPS))
+        boxes.release_floating_row(None)
+
+    def add_remove_row():
+        # removing the top row releases its view, and whichever row scrolls into view gets bound from the pool
+        boxes.scroller.scroll_y = 1
+        boxes.remove_row(boxes.row_ordering[0])
+        boxes._refresh_visible_rows()
+        boxes.add_row()
+        boxes._refresh_visible_rows()
+
+    def edit_buttons():
+        boxes.dragging_edit_btn_row = boxes.row_ordering[0]
+        boxes.update_all_edit_buttons()
+        boxes.dragging_edit_btn_row = -1
+
+    def edit_drag_targets():
+        # hover each bound row's edit button in turn, as if an edit button were being dragged over them
+        boxes.start_dragging_edit_button(boxes.row_ordering[0])
+        for view in list(boxes.row_views.values()):
+            app.hover_dispatcher.hovered = view.edit_btn
+            boxes.update_edit_drag_targets()
+        app.hover_dispatcher.hovered = None
+        boxes.dragging_edit_btn_row = -1
+        boxes.update_all_edit_buttons()
+
+    results = {
+        'Boxes.inc_time': measure(lambda: boxes.inc_time(0), repeats),
+        'HoverDispatcher._handle_mouse_move': measure(mouse_move, repeats),
+        'Boxes.update_floating_row (sweep)': measure(drag_sweep, max(1, repeats // 4)),
+        'Boxes.add_row + remove_row': measure(add_remove_row, repeats),
+        'Boxes.update_all_edit_buttons': measure(edit_buttons, repeats),
+        'Boxes.update_edit_drag_targets (sweep)': measure(edit_drag_targets, repeats),
+        'Boxes.to_json': measure(boxes.to_json, repeats),
+        'Boxes.save_to_disk': measure(lambda: boxes.save_to_disk(filepath, wait_secs=10), repeats),
+        'Boxes.from_json': measure(lambda: boxes.from_json(blob), repeats),
+        'Boxes.load_from_disk': measure(lambda: boxes.load_from_disk(filepath), repeats),
+    }
+    stats = {
+        'hover_listeners': app.hover_dispatcher.get_listener_count(),
+        'bound_row_views': len(boxes.row_views),
+    }
+
+    Window.remove_widget(boxes)
+    for row_id in list(boxes.row_views):
+        boxes._release_row_view(row_id)
+    app.hover_dispatcher.unregister_tree(boxes)
+    Clock.unschedule(boxes.timer)
+    return results, stats
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks TimeIt's hot paths.")
+    parser.add_argument('--sizes', default=",".join(str(n) for n in DEFAULT_SIZES),
+                        help="comma separated numbers of rows to benchmark with")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help="timed calls per benchmark")
+    parser.add_argument('--output', default="benchmarks.json", help="where to write the results")
+    parser.add_argument('--engine-only', action='store_true', help="skip the benchmarks that need Kivy")
+    args = parser.parse_args(argv)
+
+    suites = [('engine', bench_engine)]
+    if not args.engine_only:
+        suites.append(('ui', bench_ui))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n in (int(size) for size in args.sizes.split(",")):
+            for suite, bench in suites:
+                timings, stats = bench(n, args.repeats, tmp_dir)
+                for name, timing in timings.items():
+                    results.append({'suite': suite, 'name': name, 'n': n, **timing})
+                    print(f"INFO: {name:<40} n={n:<6} median {timing['median_us']:>12.1f}us")
+                if len(stats) > 0:
+                    results.append({'suite': suite, 'name': 'stats', 'n': n, **stats})
+
+    with open(args.output, 'w') as fp:
+        json.dump({
+            'commit': get_git_commit(),
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }, fp, indent=2)
+    print(f"INFO: Wrote {len(results)} results to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
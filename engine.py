@@ -0,0 +1,276 @@
+import time
+import traceback
+import typing
+
+from history import IntervalStore
+from ordering import RowOrdering
+
+
+def get_time_ms():
+    return int(time.time() * 1000)
+
+
+MM_SS_STRS = [f"{mins:02d}:{secs:02d}" for mins in range(60) for secs in range(60)]  # shared by every row
+
+
+def format_time_ms(millis):
+    """Formats a duration as `h:mm:ss`."""
+    secs = millis // 1000
+    return f"{secs // 3600}:{MM_SS_STRS[secs % 3600]}"
+
+
+class RowData:
+    """A single activity."""
+
+    def __init__(self, row_id, text="", elapsed_time=0):
+        self.row_id = row_id
+        self.text = text
+        self.elapsed_time = elapsed_time
+        self._time_str_secs = -1  # the second that `_time_str` shows
+        self._time_str = ""
+
+    def add_time_ms(self, millis):
+        self.set_time_ms(self.elapsed_time + millis)
+
+    def set_time_ms(self, millis):
+        self.elapsed_time = max(0, millis)
+
+    def get_time_ms(self):
+        return self.elapsed_time
+
+    def get_time_str(self):
+        secs = self.elapsed_time // 1000
+        if secs != self._time_str_secs:
+            self._time_str_secs = secs
+            self._time_str = format_time_ms(self.elapsed_time)
+        return self._time_str
+
+    def to_json(self):
+        return {
+            'elapsed_time': self.elapsed_time,
+            'text': self.text
+        }
+
+    def from_json(self, blob):
+        self.elapsed_time = int(blob['elapsed_time'])
+        self.text = str(blob['text'])
+
+
+class TimerEngine:
+    """The activities, their ordering, and which one is running (or paused), without any UI.
+
+    Every change goes through a method here, which also records it in the journal (if there is one).
+    The UI calls these and then updates whichever widgets are showing the affected rows.
+    """
+
+    def __init__(self):
+        self.row_lookup: typing.Dict[int, RowData] = {}
+        self.row_ordering = RowOrdering()
+        self.activity_id_counter = 0
+
+        self.active_row_id = -1
+        self.active_since_ms = -1
+        self.paused_row_id = -1  # the row that resumes when unpaused
+
+        self.last_time_seen_ms = get_time_ms()
+        self.journal = None  # persistence.Journal
+        self.history = IntervalStore()
+
+    def _log_event(self, kind, **fields):
+        if self.journal is not None:
+            try:
+                self.journal.append(kind, **fields)
+            except Exception:
+                print(f"ERROR: failed to journal '{kind}' event")
+                traceback.print_exc()
+
+    def _set_active_row(self, row_id, since_ms=None):
+        """Switches which row is running, recording the interval that the previous one ran for."""
+        cur_time_ms = get_time_ms()
+        self.tick(cur_time_ms)  # the time since the last tick belongs to the previous row
+        if self.active_row_id >= 0:
+            self.history.append(self.active_row_id, self.active_since_ms, cur_time_ms)
+        self.active_row_id = row_id
+        self.active_since_ms = (since_ms if since_ms is not None else cur_time_ms) if row_id >= 0 else -1
+
+    def get_open_interval(self):
+        """The interval the running row has been running for so far, as `(row_id, start_ms, end_ms)`."""
+        if self.active_row_id >= 0:
+            return self.active_row_id, self.active_since_ms, get_time_ms()
+        return None
+
+    def set_history(self, history: IntervalStore):
+        self.history = history
+        self.activity_id_counter = max(self.activity_id_counter, history.max_row_id() + 1)
+
+    def get_row_data(self, row_id=None) -> typing.Optional[RowData]:
+        if row_id is None:
+            row_id = self.active_row_id
+        return self.row_lookup.get(row_id, None)
+
+    def is_active(self, row: RowData):
+        return self.active_row_id in self.row_lookup and self.row_lookup[self.active_row_id] is row
+
+    def add_row(self, text="") -> RowData:
+        row = RowData(self.activity_id_counter, text=text)
+        self.activity_id_counter += 1
+        self.row_lookup[row.row_id] = row
+        self.row_ordering.append(row.row_id)
+        self._log_event('add', row=row.row_id)
+        if text:
+            self._log_event('rename', row=row.row_id, text=text)
+        return row
+
+    def remove_row(self, row_id):
+        if row_id in self.row_lookup:
+            del self.row_lookup[row_id]
+            self.row_ordering.remove(row_id)
+            if self.paused_row_id == row_id:
+                self.paused_row_id = -1
+            if self.active_row_id == row_id:
+                self._set_active_row(-1)
+            self._log_event('remove', row=row_id)
+
+    def move_row(self, row_id, order_idx):
+        if row_id in self.row_lookup:
+            self.row_ordering.remove(row_id)
+            self.row_ordering.insert(order_idx, row_id)
+            self._log_event('reorder', row=row_id, idx=order_idx)
+
+    def rename_row(self, row_id, text):
+        if row_id in self.row_lookup and self.row_lookup[row_id].text != text:
+            self.row_lookup[row_id].text = text
+            self._log_event('rename', row=row_id, text=text)
+
+    def start(self, row_id):
+        if row_id in self.row_lookup:
+            self.paused_row_id = -1
+            self._set_active_row(row_id)
+            self._log_event('start', row=row_id)
+
+    def stop(self):
+        if self.active_row_id >= 0 or self.paused_row_id >= 0:
+            self._set_active_row(-1)
+            self.paused_row_id = -1
+            self._log_event('stop')
+
+    def pause(self):
+        self.paused_row_id = self.active_row_id
+        self._set_active_row(-1)
+        self._log_event('pause')
+
+    def resume(self):
+        if self.paused_row_id in self.row_lookup:
+            self._set_active_row(self.paused_row_id)
+        self.paused_row_id = -1
+        self._log_event('resume', row=self.active_row_id)
+
+    def reset(self, row_id):
+        if row_id in self.row_lookup:
+            if self.active_row_id == row_id:
+                self._set_active_row(-1)
+            elif self.paused_row_id == row_id:
+                self.paused_row_id = -1
+            self.row_lookup[row_id].set_time_ms(0)
+            self._log_event('reset', row=row_id)
+
+    def transfer(self, ms_to_add, dest_id, from_id=None):
+        """Moves time from one row to another (or just adds it to `dest_id`, if there's no `from_id`).
+        A running row that ends up with zero time gets stopped."""
+        from_row = self.get_row_data(from_id) if from_id is not None else None
+        dest_row = self.get_row_data(dest_id)
+        if dest_row is None:
+            return
+        self._log_event('transfer', row=dest_id, src=from_row.row_id if from_row is not None else None,
+                        ms=ms_to_add)
+
+        if from_row is not None:
+            from_row.set_time_ms(from_row.get_time_ms() - ms_to_add)
+            if from_row.get_time_ms() == 0 and self.is_active(from_row):
+                self.stop()
+
+        dest_row.set_time_ms(dest_row.get_time_ms() + ms_to_add)
+        if dest_row.get_time_ms() == 0 and self.is_active(dest_row):
+            self.stop()
+
+    def merge_import(self, names: typing.List[str], totals_ms: typing.Optional[typing.Sequence[int]] = None
+                     ) -> typing.List[int]:
+        """Adds imported time (if given) to the activities with matching names, creating any that don't exist
+        yet. Returns the row id that each name ended up with."""
+        row_ids_by_name = {}
+        for row_id in self.row_ordering:
+            row_ids_by_name.setdefault(self.row_lookup[row_id].text.strip().lower(), row_id)
+
+        res = []
+        for i, name in enumerate(names):
+            key = name.strip().lower()
+            if key not in row_ids_by_name:
+                row_ids_by_name[key] = self.add_row(text=name).row_id
+            if totals_ms is not None and totals_ms[i] > 0:
+                self.transfer(totals_ms[i], row_ids_by_name[key])
+            res.append(row_ids_by_name[key])
+        return res
+
+    def tick(self, cur_time_ms=None):
+        """Adds the time since the last tick to the running row (if any), and returns that row."""
+        if cur_time_ms is None:
+            cur_time_ms = get_time_ms()
+        dt = cur_time_ms - self.last_time_seen_ms
+        self.last_time_seen_ms = cur_time_ms
+
+        row = self.get_row_data(self.active_row_id)
+        if row is not None:
+            row.add_time_ms(dt)
+        return row
+
+    def ms_until_next_second(self, cur_time_ms=None):
+        """How long until the running row's time shows a different second (None if nothing's running)."""
+        row = self.get_row_data(self.active_row_id)
+        if row is None:
+            return None
+        if cur_time_ms is None:
+            cur_time_ms = get_time_ms()
+        return 1000 - (row.get_time_ms() + cur_time_ms - self.last_time_seen_ms) % 1000
+
+    def bulk_load(self, rows: typing.List[RowData], active_row_id=-1, active_since_ms=None):
+        """Replaces all the rows at once, in the given order."""
+        self._set_active_row(-1)
+        self.row_lookup = {row.row_id: row for row in rows}
+        self.row_ordering = RowOrdering(row.row_id for row in rows)
+        self.activity_id_counter = max(self.activity_id_counter, max(self.row_lookup, default=-1) + 1)
+        if active_row_id in self.row_lookup:
+            self._set_active_row(active_row_id, since_ms=active_since_ms)
+        self.paused_row_id = -1
+
+    def to_json(self):
+        return {
+            'version': '1.0',
+            'timestamp_ms': get_time_ms(),
+            'active_row_id': self.active_row_id,
+            'active_since_ms': self.active_since_ms,
+            'row_lookup': {str(row_id): self.row_lookup[row_id].to_json() for row_id in self.row_lookup},
+            'row_ordering': list(self.row_ordering),
+            'journal_generation': self.journal.generation if self.journal is not None else 0
+        }
+
+    def from_json(self, blob):
+        time_since_save = get_time_ms() - int(blob['timestamp_ms'])
+        rows = []
+        active_row_id = -1
+
+        for row_id in blob['row_ordering']:
+            if str(row_id) in blob['row_lookup']:
+                new_row = RowData(int(row_id))
+                new_row.from_json(blob['row_lookup'][str(row_id)])
+
+                if row_id == blob['active_row_id']:
+                    active_row_id = new_row.row_id
+                    new_row.add_time_ms(time_since_save)
+
+                rows.append(new_row)
+
+        # (older snapshots don't say when the active row was started, so its interval starts at the save)
+        active_since_ms = int(blob.get('active_since_ms', -1))
+        if active_since_ms < 0:
+            active_since_ms = int(blob['timestamp_ms'])
+        self.bulk_load(rows, active_row_id=active_row_id, active_since_ms=active_since_ms)
@@ -0,0 +1,162 @@
+import argparse
+import csv
+import datetime
+import io
+import itertools
+import json
+import os
+import sys
+import typing
+
+from engine import format_time_ms
+from history import MappedHistory, history_path
+from reports import get_activity_name, get_saved_open_interval, load_saved_state, parse_date_range
+
+EXPORT_CHUNK_ROWS = 4096  # rows per chunk handed to the file
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+INTERVAL_FIELDS = ('activity_id', 'activity', 'start', 'end', 'start_ms', 'end_ms', 'duration_ms')
+TOTAL_FIELDS = ('activity_id', 'activity', 'total', 'total_ms')
+
+Interval = typing.Tuple[int, int, int]  # row_id, start_ms, end_ms
+
+
+def _iso_time(t_ms):
+    return datetime.datetime.fromtimestamp(t_ms / 1000).isoformat(timespec='seconds')
+
+
+def iter_intervals(history: MappedHistory, start_ms=None, end_ms=None,
+                   row_ids: typing.Optional[typing.Collection[int]] = None,
+                   open_interval: typing.Optional[Interval] = None) -> typing.Iterator[Interval]:
+    """Yields `(row_id, start_ms, end_ms)` for each interval in the window (clipped to it), in time order,
+    ending with the one that's still running, if any."""
+    for row_id, start, end in history.query(start_ms, end_ms):
+        if row_ids is None or row_id in row_ids:
+            yield row_id, start, end
+
+    if open_interval is not None:
+        row_id, start, end = open_interval
+        if start_ms is not None:
+            start = max(start, start_ms)
+        if end_ms is not None:
+            end = min(end, end_ms)
+        if start < end and (row_ids is None or row_id in row_ids):
+            yield row_id, start, end
+
+
+def iter_interval_rows(intervals: typing.Iterable[Interval], names: typing.Dict[int, str]) -> typing.Iterator[tuple]:
+    """Turns intervals (see `iter_intervals`) into rows of `INTERVAL_FIELDS`."""
+    activity_names = {}
+    for row_id, start, end in intervals:
+        if row_id not in activity_names:
+            activity_names[row_id] = get_activity_name(row_id, names)
+        yield row_id, activity_names[row_id], _iso_time(start), _iso_time(end), start, end, end - start
+
+
+def iter_total_rows(intervals: typing.Iterable[Interval], names: typing.Dict[int, str]) -> typing.Iterator[tuple]:
+    """Adds up intervals (see `iter_intervals`) into each activity's total, as rows of `TOTAL_FIELDS`."""
+    totals = {}
+    for row_id, start, end in intervals:
+        totals[row_id] = totals.get(row_id, 0) + end - start
+    for row_id in sorted(totals):
+        if totals[row_id] > 0:
+            yield row_id, get_activity_name(row_id, names), format_time_ms(totals[row_id]), totals[row_id]
+
+
+def iter_chunks(rows: typing.Iterable[tuple]) -> typing.Iterator[typing.List[tuple]]:
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, EXPORT_CHUNK_ROWS))
+        if len(chunk) == 0:
+            return
+        yield chunk
+
+
+def iter_csv_chunks(rows: typing.Iterable[tuple], fields) -> typing.Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(fields)
+    for chunk in iter_chunks(rows):
+        writer.writerows(chunk)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+
+def iter_jsonl_chunks(rows: typing.Iterable[tuple], fields) -> typing.Iterator[str]:
+    for chunk in iter_chunks(rows):
+        yield "".join(json.dumps(dict(zip(fields, row))) + "\n" for row in chunk)
+
+
+def get_export_format(filepath):
+    fmt = os.path.splitext(filepath)[1].lstrip(".").lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Can't tell the export format from {filepath} (expected one of {EXPORT_FORMATS})")
+    return fmt
+
+
+def export_rows(filepath, rows: typing.Iterable[tuple], fields, fmt=None):
+    """Streams rows to a CSV or JSON Lines file, a chunk at a time, so memory use doesn't depend on how
+    many there are. Returns how many were written."""
+    fmt = fmt or get_export_format(filepath)
+    count = itertools.count()
+    rows = (row for row, _ in zip(rows, count))  # counts the rows as they stream past
+
+    chunks = iter_csv_chunks(rows, fields) if fmt == 'csv' else iter_jsonl_chunks(rows, fields)
+    with open(filepath, 'w', encoding='utf-8', newline='') as fp:
+        for chunk in chunks:
+            fp.write(chunk)
+    return next(count)
+
+
+def resolve_activities(names: typing.Dict[int, str], activities) -> typing.Optional[typing.Set[int]]:
+    """Maps activity names or ids (as given on the command line) to ids."""
+    if not activities:
+        return None
+    res = set()
+    for activity in activities:
+        if activity.isdigit():
+            res.add(int(activity))
+        else:
+            res.update(row_id for row_id, name in names.items() if name.strip().lower() == activity.strip().lower())
+    return res
+
+
+def main(argv=None):
+    from persistence import get_default_autosave_filepath
+
+    parser = argparse.ArgumentParser(description="Exports TimeIt's history to CSV or JSON Lines.")
+    parser.add_argument('output', help="the file to write, ending in .csv or .jsonl")
+    parser.add_argument('--file', default=None, help="the autosave file to export (default: TimeIt's own)")
+    parser.add_argument('--what', choices=('intervals', 'totals'), default='intervals',
+                        help="every interval that was timed, or each activity's total (default: intervals)")
+    parser.add_argument('--from', dest='from_date', default=None, help="first date to include, as YYYY-MM-DD")
+    parser.add_argument('--to', dest='to_date', default=None, help="last date to include, as YYYY-MM-DD")
+    parser.add_argument('--activity', action='append', default=None,
+                        help="only export this activity (a name or id), can be given more than once")
+    args = parser.parse_args(argv)
+
+    filepath = args.file or get_default_autosave_filepath(and_create=False)
+    if filepath is None or not os.path.exists(filepath):
+        print(f"ERROR: no autosave file found at {filepath}")
+        return 1
+
+    blob, names = load_saved_state(filepath)
+    row_ids = resolve_activities(names, args.activity)
+
+    # the records are read straight out of the mapped history file, rather than loaded into memory first
+    with MappedHistory(history_path(filepath)) as history:
+        start_ms, end_ms = parse_date_range(args.from_date, args.to_date, history)
+        intervals = iter_intervals(history, start_ms, end_ms, row_ids, get_saved_open_interval(blob))
+        if args.what == 'intervals':
+            count = export_rows(args.output, iter_interval_rows(intervals, names), INTERVAL_FIELDS)
+        else:
+            count = export_rows(args.output, iter_total_rows(intervals, names), TOTAL_FIELDS)
+
+    print(f"INFO: Exported {count} {args.what} to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,296 @@
+import mmap
+import os
+import sys
+import typing
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right
+
+from persistence import write_file_atomic
+
+HISTORY_MAGIC = b"TIHIST1\n"
+HISTORY_HEADER_SIZE = len(HISTORY_MAGIC)
+HISTORY_RECORD_FIELDS = 3  # start_ms, end_ms, row_id
+HISTORY_RECORD_SIZE = HISTORY_RECORD_FIELDS * 8
+
+
+class IntervalStore:
+    """Every stretch of time that an activity's timer ran for, as three parallel int64 columns.
+
+    Intervals are appended in time order, and never overlap (only one timer runs at a time), so both
+    `starts` and `ends` are sorted and a time window can be found by bisecting them. A per-activity
+    index of record numbers makes queries for a single activity just as quick.
+
+    When attached to a file, each interval is also appended to it as a fixed-size record (three
+    little-endian int64s), so the file can be memory-mapped and split back into columns without
+    parsing anything.
+    """
+
+    def __init__(self):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.row_ids = array('q')
+        self._by_row: typing.Dict[int, array] = {}
+        self._fp = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def append(self, row_id, start_ms, end_ms):
+        # clamp against the previous interval, so the columns stay sorted even if the clock jumps back
+        if len(self.ends) > 0:
+            start_ms = max(start_ms, self.ends[-1])
+        end_ms = max(end_ms, start_ms)
+        if end_ms == start_ms:
+            return
+
+        self._by_row.setdefault(row_id, array('q')).append(len(self.starts))
+        self.starts.append(start_ms)
+        self.ends.append(end_ms)
+        self.row_ids.append(row_id)
+
+        if self._fp is not None:
+            self._fp.write(_to_little_endian(array('q', (start_ms, end_ms, row_id))).tobytes())
+            self._fp.flush()
+
+    def get_row_ids(self):
+        return self._by_row.keys()
+
+    def max_row_id(self):
+        return max(self._by_row, default=-1)
+
+    def _record_range(self, start_ms=None, end_ms=None):
+        return _record_range(self.starts, self.ends, start_ms, end_ms)
+
+    def _row_record_range(self, positions, start_ms=None, end_ms=None):
+        """Like `_record_range`, but for indexes into one activity's list of record numbers."""
+        lo, hi = 0, len(positions)
+        if start_ms is not None:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.ends[positions[mid]] <= start_ms:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        res_lo, hi = lo, len(positions)
+        if end_ms is not None:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.starts[positions[mid]] < end_ms:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            hi = lo
+        return res_lo, hi
+
+    def iter_records(self, start_ms=None, end_ms=None, row_id=None) -> typing.Iterator[int]:
+        """Yields the record numbers of the intervals overlapping the window, in time order."""
+        if row_id is None:
+            yield from range(*self._record_range(start_ms, end_ms))
+        elif row_id in self._by_row:
+            positions = self._by_row[row_id]
+            lo, hi = self._row_record_range(positions, start_ms, end_ms)
+            for idx in range(lo, hi):
+                yield positions[idx]
+
+    def query(self, start_ms=None, end_ms=None, row_id=None) -> typing.Iterator[typing.Tuple[int, int, int]]:
+        """Yields `(row_id, start_ms, end_ms)` for the intervals in the window (clipped to it), in time order."""
+        return _clip_records(self.starts, self.ends, self.row_ids, self.iter_records(start_ms, end_ms, row_id),
+                             start_ms, end_ms)
+
+    def total_ms(self, start_ms=None, end_ms=None, row_id=None):
+        return sum(end - start for _, start, end in self.query(start_ms, end_ms, row_id))
+
+    def totals_by_row(self, start_ms=None, end_ms=None) -> typing.Dict[int, int]:
+        res = {}
+        for row_id, start, end in self.query(start_ms, end_ms):
+            res[row_id] = res.get(row_id, 0) + end - start
+        return res
+
+    def attach(self, filepath):
+        """Appends every interval recorded from now on to the given file (which should hold this
+        store's existing records already, see `load`)."""
+        self.detach()
+        if not os.path.exists(filepath) or os.path.getsize(filepath) < HISTORY_HEADER_SIZE:
+            with open(filepath, 'wb') as fp:
+                fp.write(HISTORY_MAGIC)
+        else:
+            truncate_torn_record(filepath)
+        self._fp = open(filepath, 'ab')
+
+    def detach(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    @staticmethod
+    def from_columns(starts: array, ends: array, row_ids: array) -> 'IntervalStore':
+        """Builds a store from intervals in any order, sorting them and trimming any overlaps away."""
+        res = IntervalStore()
+        if all(starts[i] <= starts[i + 1] for i in range(len(starts) - 1)):
+            order = range(len(starts))
+        else:
+            order = sorted(range(len(starts)), key=starts.__getitem__)
+        for rec in order:
+            res.append(row_ids[rec], starts[rec], ends[rec])
+        return res
+
+    def save(self, filepath):
+        """Writes all the intervals to a new history file, replacing it atomically if it exists."""
+        records = array('q', bytes(len(self) * HISTORY_RECORD_SIZE))
+        for i, column in enumerate((self.starts, self.ends, self.row_ids)):
+            records[i::HISTORY_RECORD_FIELDS] = column
+
+        def write(fp):
+            fp.write(HISTORY_MAGIC)
+            fp.write(_to_little_endian(records))
+        write_file_atomic(filepath, write, mode='wb')
+
+    @staticmethod
+    def load(filepath) -> 'IntervalStore':
+        """Reads a history file by memory-mapping it and copying each column out of the records. The file is
+        only read, so it's safe to do while the app is appending to it."""
+        res = IntervalStore()
+        if not os.path.exists(filepath) or os.path.getsize(filepath) <= HISTORY_HEADER_SIZE:
+            return res
+
+        with open(filepath, 'rb') as fp:
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:HISTORY_HEADER_SIZE] != HISTORY_MAGIC:
+                    raise ValueError(f"Not a history file: {filepath}")
+                n = _num_whole_records(len(mm))
+                with memoryview(mm) as view:
+                    with view[HISTORY_HEADER_SIZE:HISTORY_HEADER_SIZE + n * HISTORY_RECORD_SIZE].cast('q') as fields:
+                        for i, column in enumerate((res.starts, res.ends, res.row_ids)):
+                            column.frombytes(fields[i::HISTORY_RECORD_FIELDS].tobytes())
+
+        for column in (res.starts, res.ends, res.row_ids):
+            _to_little_endian(column)  # (or rather, from little endian)
+
+        for rec, row_id in enumerate(res.row_ids):
+            res._by_row.setdefault(row_id, array('q')).append(rec)
+        return res
+
+
+class MappedHistory:
+    """A read-only view of a history file that reads the records straight out of the memory-mapped file,
+    so going through even a huge history doesn't copy it into memory. Use it as a context manager.
+
+    `starts`, `ends` and `row_ids` are sequences over the mapped records, sorted like `IntervalStore`'s,
+    so a time window is found by bisecting them just the same.
+    """
+
+    def __init__(self, filepath):
+        self._fp = None
+        self._mm = None
+        self._fields = None
+        self._queries = weakref.WeakSet()  # unfinished `query` generators, which hold views of the mapping
+        self.starts = self.ends = self.row_ids = ()
+        if not os.path.exists(filepath) or os.path.getsize(filepath) <= HISTORY_HEADER_SIZE:
+            return
+
+        self._fp = open(filepath, 'rb')
+        self._mm = mmap.mmap(self._fp.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:HISTORY_HEADER_SIZE] != HISTORY_MAGIC:
+            self.close()
+            raise ValueError(f"Not a history file: {filepath}")
+        n = _num_whole_records(len(self._mm))
+        self._fields = memoryview(self._mm)[HISTORY_HEADER_SIZE:HISTORY_HEADER_SIZE + n * HISTORY_RECORD_SIZE]
+        if sys.byteorder == 'little':
+            self._fields = self._fields.cast('q')
+            self.starts, self.ends, self.row_ids = (self._fields[i::HISTORY_RECORD_FIELDS]
+                                                    for i in range(HISTORY_RECORD_FIELDS))
+        else:
+            self.starts, self.ends, self.row_ids = (_LittleEndianColumn(self._fields, i)
+                                                    for i in range(HISTORY_RECORD_FIELDS))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # the mapping can't be closed while anything still holds a view of it, like a query that was
+        # abandoned part way through (say, because writing out its results failed)
+        for query in list(self._queries):
+            query.close()
+        self.starts = self.ends = self.row_ids = ()
+        try:
+            if self._fields is not None:
+                self._fields.release()
+            if self._mm is not None:
+                self._mm.close()
+        finally:
+            self._fields = self._mm = None
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+
+    def query(self, start_ms=None, end_ms=None) -> typing.Iterator[typing.Tuple[int, int, int]]:
+        """Yields `(row_id, start_ms, end_ms)` for the intervals in the window (clipped to it), in time order."""
+        res = _clip_records(self.starts, self.ends, self.row_ids,
+                            range(*_record_range(self.starts, self.ends, start_ms, end_ms)), start_ms, end_ms)
+        self._queries.add(res)
+        return res
+
+
+class _LittleEndianColumn:
+    """One column of the mapped records, for big-endian machines, where they can't just be cast."""
+
+    def __init__(self, fields: memoryview, field_idx):
+        self._fields = fields
+        self._field_idx = field_idx
+
+    def __len__(self):
+        return len(self._fields) // HISTORY_RECORD_SIZE
+
+    def __getitem__(self, rec):
+        if rec < 0:
+            rec += len(self)
+        offset = rec * HISTORY_RECORD_SIZE + self._field_idx * 8
+        return int.from_bytes(self._fields[offset:offset + 8], 'little', signed=True)
+
+
+def _record_range(starts, ends, start_ms=None, end_ms=None):
+    """The record numbers [lo, hi) of the intervals that overlap the given window (given sorted columns)."""
+    lo = 0 if start_ms is None else bisect_right(ends, start_ms)
+    hi = len(starts) if end_ms is None else bisect_left(starts, end_ms)
+    return lo, max(lo, hi)
+
+
+def _clip_records(starts, ends, row_ids, records: typing.Iterable[int], start_ms=None, end_ms=None
+                  ) -> typing.Iterator[typing.Tuple[int, int, int]]:
+    for rec in records:
+        start, end = starts[rec], ends[rec]
+        if start_ms is not None:
+            start = max(start, start_ms)
+        if end_ms is not None:
+            end = min(end, end_ms)
+        yield row_ids[rec], start, end
+
+
+def _num_whole_records(file_size):
+    return (file_size - HISTORY_HEADER_SIZE) // HISTORY_RECORD_SIZE
+
+
+def truncate_torn_record(filepath):
+    """Cuts off a record at the end of a history file that was only half-written when the app died. Readers
+    just ignore such a record (see `_num_whole_records`), and only whatever's about to append to the file
+    should cut it off."""
+    whole_size = HISTORY_HEADER_SIZE + _num_whole_records(os.path.getsize(filepath)) * HISTORY_RECORD_SIZE
+    if whole_size < os.path.getsize(filepath):
+        os.truncate(filepath, whole_size)
+
+
+def _to_little_endian(column: array):
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+def history_path(snapshot_path):
+    return f"{os.path.splitext(snapshot_path)[0]}.history.bin"
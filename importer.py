@@ -0,0 +1,342 @@
+import csv
+import datetime
+import json
+import os
+import tempfile
+import threading
+import traceback
+import typing
+from array import array
+
+from engine import format_time_ms
+from history import IntervalStore
+from timeexpr import clock_to_minutes
+
+IMPORT_FORMATS = ('csv', 'jsonl')
+IMPORT_PROGRESS_EVERY_ROWS = 5000
+
+# column names that other trackers use, in order of preference (compared case-insensitively)
+ACTIVITY_COLUMNS = ('activity', 'project', 'task', 'description', 'name', 'title', 'client')
+START_COLUMNS = ('start_ms', 'start', 'start time', 'start_time', 'started', 'started_at', 'start date', 'begin', 'from')
+END_COLUMNS = ('end_ms', 'end', 'end time', 'end_time', 'stopped', 'stopped_at', 'end date', 'finish', 'to')
+DURATION_COLUMNS = ('duration_ms', 'total_ms', 'duration', 'duration (h)', 'duration (decimal)', 'elapsed', 'time',
+                    'hours', 'minutes', 'seconds')
+# trackers like Toggl & Clockify split each timestamp into a date column and a time column
+START_DATE_COLUMNS = ('start date', 'start_date')
+START_TIME_COLUMNS = ('start time', 'start_time')
+END_DATE_COLUMNS = ('end date', 'end_date')
+END_TIME_COLUMNS = ('end time', 'end_time')
+HOURS_COLUMNS = ('hours', 'duration (decimal)')
+
+# other date/time formats to try, for ones that aren't ISO 8601 (Clockify's default is the first)
+TIMESTAMP_FORMATS = ('%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y %I:%M %p', '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M',
+                     '%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M')
+
+
+class ColumnMapping:
+    """Which columns of an import file hold the activity name, and when (or how long) it was tracked.
+    A row needs a start & end, or a start or end plus a duration, to become an interval. Rows with just
+    a duration (or whose start & end can't be read) only add to the activity's total.
+
+    `start` and `end` are either a column name or a `(date column, time column)` pair."""
+
+    def __init__(self, activity, start=None, end=None, duration=None):
+        self.activity = activity
+        self.start = start
+        self.end = end
+        self.duration = duration
+
+    @staticmethod
+    def guess(columns: typing.Iterable[str]) -> 'ColumnMapping':
+        columns = [column.strip().lower() for column in columns]
+
+        def find(candidates):
+            return next((column for column in candidates if column in columns), None)
+
+        def find_timestamp(date_candidates, time_candidates, candidates):
+            date_column, time_column = find(date_candidates), find(time_candidates)
+            if date_column is not None and time_column is not None:
+                return date_column, time_column
+            return find(candidates)
+
+        res = ColumnMapping(find(ACTIVITY_COLUMNS),
+                            find_timestamp(START_DATE_COLUMNS, START_TIME_COLUMNS, START_COLUMNS),
+                            find_timestamp(END_DATE_COLUMNS, END_TIME_COLUMNS, END_COLUMNS),
+                            find(DURATION_COLUMNS))
+        if res.activity is None:
+            raise ValueError(f"Can't tell which column holds the activity (expected one of {ACTIVITY_COLUMNS})")
+        elif res.duration is None and (res.start is None or res.end is None):
+            raise ValueError("Can't tell when each activity was tracked (expected start & end, or duration, columns)")
+        return res
+
+
+def parse_timestamp_ms(value):
+    """Epoch seconds or milliseconds, or an ISO 8601 date/time (local time unless it says otherwise), or
+    one of the `TIMESTAMP_FORMATS`."""
+    value = str(value).strip()
+    try:
+        number = float(value)
+        return int(number if number > 1e11 else number * 1000)
+    except ValueError:
+        pass
+    try:
+        return int(datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+    except ValueError:
+        pass
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return int(datetime.datetime.strptime(value, fmt).timestamp() * 1000)
+        except ValueError:
+            pass
+    raise ValueError(f"Can't read the date/time {value!r}")
+
+
+def get_timestamp_ms(record: typing.Dict[str, str], column) -> typing.Optional[int]:
+    """Reads a timestamp out of a record, from one column or a `(date column, time column)` pair. Returns
+    None if it's empty or can't be read."""
+    if isinstance(column, tuple):
+        date, time = (str(record.get(part) or "").strip() for part in column)
+        value = f"{date} {time}" if date and time else None
+    else:
+        value = record.get(column)
+    if not value:
+        return None
+    try:
+        return parse_timestamp_ms(value)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def parse_duration_ms(value, column):
+    """`h:mm:ss` / `h:mm`, or a number in the unit that the column's name suggests (seconds by default)."""
+    value = str(value).strip()
+    if ":" in value:
+        parts = value.split(":")
+        return int(clock_to_minutes(value if len(parts) > 2 else value + ":00") * 60 * 1000)
+    number = float(value)
+    if column.endswith('_ms'):
+        return int(number)
+    elif column in HOURS_COLUMNS:
+        return int(number * 60 * 60 * 1000)
+    elif column == 'minutes':
+        return int(number * 60 * 1000)
+    else:
+        return int(number * 1000)
+
+
+class ImportResult:
+    """What was read out of an import file, with activities referred to by their index in `names`."""
+
+    def __init__(self):
+        self.names: typing.List[str] = []
+        self.totals_ms = array('q')
+        self.untimed_ms = array('q')  # the part of each total that came from rows without a start & end
+        self.starts = array('q')
+        self.ends = array('q')
+        self.name_idxs = array('q')
+        self.num_rows = 0
+        self.num_skipped = 0
+        # filled in once the intervals are merged into the history, which trims away any overlaps
+        self.added_ms_by_row: typing.Dict[int, int] = {}
+        self.trimmed_ms = 0
+
+
+def _iter_lines(fp, total_bytes, progress):
+    """Decodes a binary file line by line, reporting how far through it we are every so often."""
+    bytes_read = 0
+    for n, line in enumerate(fp, 1):
+        bytes_read += len(line)
+        if progress is not None and n % IMPORT_PROGRESS_EVERY_ROWS == 0:
+            progress(bytes_read / max(1, total_bytes))
+        yield line.decode('utf-8-sig' if n == 1 else 'utf-8')
+
+
+def iter_import_records(filepath, progress=None) -> typing.Iterator[typing.Dict[str, str]]:
+    """Yields each record of a CSV or JSON Lines file as a dict, streaming the file rather than reading it all in."""
+    fmt = os.path.splitext(filepath)[1].lstrip(".").lower()
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Can't tell the import format from {filepath} (expected one of {IMPORT_FORMATS})")
+
+    with open(filepath, 'rb') as fp:
+        lines = _iter_lines(fp, os.path.getsize(filepath), progress)
+        if fmt == 'csv':
+            for record in csv.DictReader(lines):
+                yield {str(key).strip().lower(): value for key, value in record.items() if key is not None}
+        else:
+            for line in lines:
+                if line.strip():
+                    yield {str(key).strip().lower(): value for key, value in json.loads(line).items()}
+
+
+def read_import_file(filepath, mapping: ColumnMapping = None, progress=None) -> ImportResult:
+    """Reads a whole import file into an `ImportResult`. Rows that can't be parsed are skipped (and counted).
+    If no mapping is given, it's guessed from the column names (for each distinct set of JSON keys)."""
+    res = ImportResult()
+    name_idxs = {}
+    guessed_mappings = {}
+
+    for record in iter_import_records(filepath, progress):
+        res.num_rows += 1
+        try:
+            if mapping is not None:
+                record_mapping = mapping
+            else:
+                columns = tuple(record.keys())
+                if columns not in guessed_mappings:
+                    guessed_mappings[columns] = ColumnMapping.guess(columns)
+                record_mapping = guessed_mappings[columns]
+
+            name = str(record.get(record_mapping.activity) or "").strip()
+            # (a row whose start or end can't be read still counts towards the total, if it has a duration)
+            start = get_timestamp_ms(record, record_mapping.start)
+            end = get_timestamp_ms(record, record_mapping.end)
+            duration = parse_duration_ms(record[record_mapping.duration], record_mapping.duration) \
+                if record.get(record_mapping.duration) else None
+
+            if start is not None and end is None and duration is not None:
+                end = start + duration
+            elif start is None and end is not None and duration is not None:
+                start = end - duration
+            if start is not None and end is not None:
+                duration = end - start
+            if duration is None or duration < 0:
+                raise ValueError(f"No duration in row {res.num_rows}")
+        except (ValueError, KeyError, TypeError):
+            res.num_skipped += 1
+            continue
+
+        if name not in name_idxs:
+            name_idxs[name] = len(res.names)
+            res.names.append(name)
+            res.totals_ms.append(0)
+            res.untimed_ms.append(0)
+        name_idx = name_idxs[name]
+        res.totals_ms[name_idx] += duration
+        if start is not None:
+            res.starts.append(start)
+            res.ends.append(end)
+            res.name_idxs.append(name_idx)
+        else:
+            res.untimed_ms[name_idx] += duration
+
+    if progress is not None:
+        progress(1.0)
+    return res
+
+
+class Importer:
+    """Reads an import file and merges it into the history on worker threads, touching the engine only on the
+    UI thread (via `run_on_ui(func)`, which is also where `progress` and `on_done`, given None on failure, run)."""
+
+    def __init__(self, engine, filepath, run_on_ui, history_filepath=None, progress=None, on_done=None):
+        self.engine = engine
+        self.filepath = filepath
+        self.history_filepath = history_filepath
+        self.run_on_ui = run_on_ui
+        self.progress = progress
+        self.on_done = on_done
+        self.result: typing.Optional[ImportResult] = None
+
+    def start(self):
+        threading.Thread(target=self._read, name="Importer", daemon=True).start()
+
+    def _report_progress(self, fraction):
+        if self.progress is not None:
+            self.run_on_ui(lambda: self.progress(fraction))
+
+    def _fail(self, msg):
+        print(f"ERROR: {msg}")
+        traceback.print_exc()
+        if self.on_done is not None:
+            self.run_on_ui(lambda: self.on_done(None))
+
+    def _read(self):
+        try:
+            self.result = read_import_file(self.filepath, progress=self._report_progress)
+        except Exception:
+            self._fail(f"failed to read {self.filepath}")
+            return
+        self.run_on_ui(self._apply_activities)
+
+    def _apply_activities(self):
+        row_ids = self.engine.merge_import(self.result.names)
+        history = self.engine.history
+        # (copying the columns is a memcpy, it's rebuilding the store that's slow)
+        columns = (array('q', history.starts), array('q', history.ends), array('q', history.row_ids))
+        threading.Thread(target=lambda: self._merge_history(history, columns, row_ids),
+                         name="Importer", daemon=True).start()
+
+    def _merge_history(self, history, columns, row_ids):
+        tmp_filepath = None
+        try:
+            result = self.result
+            starts, ends, history_row_ids = columns
+            merged = IntervalStore.from_columns(starts + result.starts, ends + result.ends,
+                                                history_row_ids + array('q', (row_ids[i] for i in result.name_idxs)))
+
+            # overlaps get trimmed away, so work out what the merge added to each activity from what it kept
+            added_ms = merged.totals_by_row()
+            for rec in range(len(starts)):
+                row_id = history_row_ids[rec]
+                added_ms[row_id] = added_ms.get(row_id, 0) - (ends[rec] - starts[rec])
+            for name_idx, untimed_ms in enumerate(result.untimed_ms):
+                if untimed_ms > 0:
+                    added_ms[row_ids[name_idx]] = added_ms.get(row_ids[name_idx], 0) + untimed_ms
+            result.added_ms_by_row = {row_id: ms for row_id, ms in added_ms.items() if ms != 0}
+            result.trimmed_ms = sum(result.totals_ms) - sum(result.added_ms_by_row.values())
+
+            if self.history_filepath is not None:
+                fd, tmp_filepath = tempfile.mkstemp(prefix=f".{os.path.basename(self.history_filepath)}.",
+                                                    suffix=".import.tmp",
+                                                    dir=os.path.dirname(os.path.abspath(self.history_filepath)))
+                os.close(fd)
+                merged.save(tmp_filepath)
+        except Exception:
+            _remove_quietly(tmp_filepath)
+            self._fail(f"failed to merge the history imported from {self.filepath}")
+            return
+        self.run_on_ui(lambda: self._swap_history(history, len(starts), merged, tmp_filepath))
+
+    def _swap_history(self, history, num_copied, merged, tmp_filepath):
+        if self.engine.history is not history:
+            # (something else swapped the history in the meantime, so the merge is out of date)
+            _remove_quietly(tmp_filepath)
+            print(f"ERROR: the history changed while importing {self.filepath}, not merging it")
+            if self.on_done is not None:
+                self.on_done(None)
+            return
+
+        try:
+            if tmp_filepath is not None:
+                history.detach()
+                merged.attach(tmp_filepath)
+            for rec in range(num_copied, len(history)):
+                merged.append(history.row_ids[rec], history.starts[rec], history.ends[rec])
+            if tmp_filepath is not None:
+                merged.detach()
+                os.replace(tmp_filepath, self.history_filepath)
+                merged.attach(self.history_filepath)
+            self.engine.set_history(merged)
+        except Exception:
+            merged.detach()
+            _remove_quietly(tmp_filepath)
+            if tmp_filepath is not None and self.engine.history is history:
+                history.attach(self.history_filepath)  # carry on recording into the old one
+            self._fail(f"failed to save the history imported from {self.filepath}")
+            return
+
+        for row_id, added_ms in self.result.added_ms_by_row.items():
+            self.engine.transfer(added_ms, row_id)
+        print(f"INFO: Imported {self.result.num_rows - self.result.num_skipped} rows ({len(self.result.starts)} "
+              f"intervals, {self.result.num_skipped} skipped) into {len(self.result.names)} activities "
+              f"from {self.filepath}, trimming {format_time_ms(self.result.trimmed_ms)} of overlapping time")
+        if self.on_done is not None:
+            self.on_done(self.result)
+
+
+def _remove_quietly(filepath):
+    if filepath is not None and os.path.exists(filepath):
+        try:
+            os.remove(filepath)
+        except OSError:
+            traceback.print_exc()
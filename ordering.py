@@ -0,0 +1,168 @@
+import itertools
+import typing
+
+BLOCK_LOAD = 128  # rows per block when they're first split up; a block is split in two at twice this
+
+
+class _Block(list):
+    __slots__ = ('pos',)  # the block's position in `RowOrdering._blocks`, as of the last index rebuild
+
+
+class RowOrdering:
+    """The order the rows are shown in, as a list-like sequence of row ids that also knows where each id is.
+
+    The rows are kept in short blocks (plain lists of at most 2 * BLOCK_LOAD ids, in order), plus a map from
+    each row id to its block and a Fenwick tree over the block lengths. A row's position is the count of
+    rows in the blocks before its own (O(log n)) plus its offset in the block, and the row at a position
+    is a descent through the tree then an offset into a block. Adding, removing or moving a row only
+    shifts the ids in one block. Blocks that grow too big are split and ones that get too small are
+    merged into a neighbour, after which the tree is rebuilt, lazily, in O(n / BLOCK_LOAD), so that
+    cost is spread over the BLOCK_LOAD-ish changes it takes to get there.
+    """
+
+    def __init__(self, row_ids: typing.Iterable[int] = ()):
+        row_ids = list(row_ids)
+        self._blocks: typing.List[_Block] = [_Block(row_ids[i:i + BLOCK_LOAD])
+                                             for i in range(0, len(row_ids), BLOCK_LOAD)]
+        self._block_of: typing.Dict[int, _Block] = {}
+        for block in self._blocks:
+            self._block_of.update(dict.fromkeys(block, block))
+        self._tree: typing.List[int] = [0]
+        self._tree_stale = True
+
+    def _update_index(self):
+        """Rebuilds the Fenwick tree (and the blocks' positions) after blocks were split or merged."""
+        if not self._tree_stale:
+            return
+        blocks = self._blocks
+        tree = [0]
+        tree.extend(map(len, blocks))
+        m = len(blocks)
+        for i in range(1, m + 1):
+            blocks[i - 1].pos = i - 1
+            parent = i + (i & -i)
+            if parent <= m:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._tree_stale = False
+
+    def _add(self, block: _Block, delta):
+        if self._tree_stale:
+            return  # (the rebuild will count it)
+        tree = self._tree
+        i = block.pos + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def _count_before(self, block: _Block):
+        """How many rows are in the blocks before the given one."""
+        tree = self._tree
+        res = 0
+        i = block.pos
+        while i > 0:
+            res += tree[i]
+            i -= i & -i
+        return res
+
+    def _locate(self, idx) -> typing.Tuple[_Block, int]:
+        """The block holding the row at position `idx` (which must be in range), and its offset in it."""
+        self._update_index()
+        tree = self._tree
+        m = len(tree) - 1
+        pos = 0
+        step = 1 << (m.bit_length() - 1) if m > 0 else 0
+        while step > 0:
+            if pos + step <= m and tree[pos + step] <= idx:
+                pos += step
+                idx -= tree[pos]
+            step //= 2
+        return self._blocks[pos], idx
+
+    def _split(self, block: _Block):
+        self._update_index()
+        new_block = _Block(block[BLOCK_LOAD:])
+        del block[BLOCK_LOAD:]
+        self._blocks.insert(block.pos + 1, new_block)
+        self._block_of.update(dict.fromkeys(new_block, new_block))
+        self._tree_stale = True
+
+    def _merge(self, block: _Block):
+        """Folds a block that's gotten small into a neighbour (or drops it, if it's empty)."""
+        self._update_index()
+        pos = block.pos
+        del self._blocks[pos]
+        self._tree_stale = True
+        if len(block) == 0 or len(self._blocks) == 0:
+            if len(block) > 0:
+                self._blocks.append(block)
+            return
+        if pos > 0:
+            neighbour = self._blocks[pos - 1]
+            neighbour.extend(block)
+        else:
+            neighbour = self._blocks[0]
+            neighbour[:0] = block
+        self._block_of.update(dict.fromkeys(block, neighbour))
+        if len(neighbour) > 2 * BLOCK_LOAD:
+            self._split(neighbour)
+
+    def __len__(self):
+        return len(self._block_of)
+
+    def __contains__(self, row_id):
+        return row_id in self._block_of
+
+    def __iter__(self) -> typing.Iterator[int]:
+        return itertools.chain.from_iterable(self._blocks)
+
+    def __getitem__(self, idx) -> int:
+        n = len(self._block_of)
+        if idx < 0:
+            idx += n
+        if not 0 <= idx < n:
+            raise IndexError("row ordering index out of range")
+        block, offset = self._locate(idx)
+        return block[offset]
+
+    def __repr__(self):
+        return f"RowOrdering({list(self)})"
+
+    def index(self, row_id) -> int:
+        if row_id not in self._block_of:
+            raise ValueError(f"{row_id} is not in the row ordering")
+        block = self._block_of[row_id]
+        self._update_index()
+        return self._count_before(block) + block.index(row_id)
+
+    def append(self, row_id):
+        if len(self._blocks) == 0 or len(self._blocks[-1]) >= 2 * BLOCK_LOAD:
+            self._blocks.append(_Block())
+            self._tree_stale = True
+        block = self._blocks[-1]
+        block.append(row_id)
+        self._block_of[row_id] = block
+        self._add(block, 1)
+
+    def insert(self, idx, row_id):
+        n = len(self._block_of)
+        if idx < 0:
+            idx = max(0, idx + n)
+        if idx >= n:
+            self.append(row_id)
+            return
+        block, offset = self._locate(idx)
+        block.insert(offset, row_id)
+        self._block_of[row_id] = block
+        self._add(block, 1)
+        if len(block) > 2 * BLOCK_LOAD:
+            self._split(block)
+
+    def remove(self, row_id):
+        if row_id not in self._block_of:
+            raise ValueError(f"{row_id} is not in the row ordering")
+        block = self._block_of.pop(row_id)
+        block.remove(row_id)
+        self._add(block, -1)
+        if len(block) < BLOCK_LOAD // 4 and (len(self._blocks) > 1 or len(block) == 0):
+            self._merge(block)
@@ -0,0 +1,286 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import traceback
+import typing
+
+JOURNAL_COMPACT_BYTES = 256 * 1024  # fold the journal into the snapshot once it gets this big
+AUTOSAVE_FILENAME = "autosave.json"
+
+
+def get_app_data_dir():
+    """Where TimeIt keeps its files. Raises an ImportError if appdirs isn't installed."""
+    import appdirs
+    return appdirs.user_data_dir("TimeIt", "Ghast")
+
+
+def get_default_autosave_dir():
+    """Where TimeIt keeps its autosaves. Raises an ImportError if appdirs isn't installed."""
+    return os.path.join(get_app_data_dir(), "autosaves")
+
+
+def get_default_autosave_filepath(and_create=True):
+    """Returns None if appdirs isn't installed."""
+    try:
+        autosave_dir = get_default_autosave_dir()
+    except ImportError:
+        return None
+    if and_create:
+        os.makedirs(autosave_dir, exist_ok=True)
+    return os.path.join(autosave_dir, AUTOSAVE_FILENAME)
+
+
+def write_file_atomic(filepath, write: typing.Callable[[typing.IO], None], mode='w'):
+    """Writes a file (by calling `write` with it) such that it always holds either the old or the new contents.
+
+    The data goes to a temp file in the same directory, is fsync'd, and then renamed over the
+    destination, so a crash mid-write can't leave a truncated file behind.
+    """
+    dirpath = os.path.dirname(os.path.abspath(filepath))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(filepath)}.", suffix=".tmp", dir=dirpath)
+    try:
+        with os.fdopen(fd, mode) as fp:
+            write(fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(filepath, blob):
+    write_file_atomic(filepath, lambda fp: json.dump(blob, fp))
+
+
+def write_snapshot(filepath, blob):
+    """Atomically writes a snapshot, then deletes the journals it has made obsolete."""
+    write_json_atomic(filepath, blob)
+    if 'journal_generation' in blob:
+        delete_journals(filepath, below=blob['journal_generation'])
+
+
+class AutosaveWriter:
+    """Writes JSON snapshots on a background thread.
+
+    The UI thread hands over a snapshot (a plain dict that it won't touch again, or a function that
+    builds one on the worker) and returns immediately, and the encoding & atomic write happen on the
+    worker. Saves that are requested while a write is in flight are coalesced, so only the most
+    recent snapshot gets written.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = None  # (filepath, blob)
+        self._busy = False
+        self._thread = threading.Thread(target=self._run, name="AutosaveWriter", daemon=True)
+        self._thread.start()
+
+    def request_save(self, filepath, blob):
+        with self._cond:
+            self._pending = (filepath, blob)
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Blocks until every requested save has been written. Returns False if the timeout expired first."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout=timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None)
+                filepath, blob = self._pending
+                self._pending = None
+                self._busy = True
+            try:
+                if callable(blob):
+                    blob = blob()
+                if blob is not None:
+                    write_snapshot(filepath, blob)
+            except Exception:
+                print(f"ERROR: failed to autosave to {filepath}")
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+
+def journal_path(snapshot_path, generation):
+    return f"{os.path.splitext(snapshot_path)[0]}.journal.{generation}.jsonl"
+
+
+def list_journal_generations(snapshot_path):
+    dirpath, basename = os.path.split(os.path.abspath(snapshot_path))
+    pattern = re.compile(re.escape(os.path.splitext(basename)[0]) + r"\.journal\.(\d+)\.jsonl")
+    res = []
+    if os.path.isdir(dirpath):
+        for filename in os.listdir(dirpath):
+            match = pattern.fullmatch(filename)
+            if match is not None:
+                res.append(int(match.group(1)))
+    return sorted(res)
+
+
+def delete_journals(snapshot_path, below):
+    for generation in list_journal_generations(snapshot_path):
+        if generation < below:
+            try:
+                os.remove(journal_path(snapshot_path, generation))
+            except OSError:
+                traceback.print_exc()
+
+
+def next_journal_generation(snapshot_path):
+    res = 0
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'r') as fp:
+            res = int(json.load(fp).get('journal_generation', 0))
+    return max([res] + list_journal_generations(snapshot_path)) + 1
+
+
+def read_events(path):
+    with open(path, 'r', encoding='utf-8') as fp:
+        for line in fp:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                pass  # a torn last line, like history.truncate_torn_record's
+
+
+def replay_events(blob, events):
+    """Applies journal events, in order, to a snapshot (in `Boxes.to_json` format)."""
+    rows = blob['row_lookup']
+    ordering = blob['row_ordering']
+    last_t = int(blob['timestamp_ms'])
+
+    for evt in events:
+        t = int(evt['t'])
+        active_key = str(blob['active_row_id'])
+        if active_key in rows and t > last_t:
+            rows[active_key]['elapsed_time'] += t - last_t
+        last_t = max(last_t, t)
+
+        kind = evt['e']
+        row_key = str(evt.get('row'))
+        if kind in ('start', 'resume'):
+            blob['active_row_id'] = evt['row']
+            blob['active_since_ms'] = t
+        elif kind in ('stop', 'pause'):
+            blob['active_row_id'] = -1
+            blob['active_since_ms'] = -1
+        elif kind == 'transfer':
+            if str(evt.get('src')) in rows:
+                src = rows[str(evt['src'])]
+                src['elapsed_time'] = max(0, src['elapsed_time'] - evt['ms'])
+            if row_key in rows:
+                rows[row_key]['elapsed_time'] = max(0, rows[row_key]['elapsed_time'] + evt['ms'])
+        elif kind == 'reset':
+            if row_key in rows:
+                rows[row_key]['elapsed_time'] = 0
+            if blob['active_row_id'] == evt['row']:
+                blob['active_row_id'] = -1
+        elif kind == 'rename':
+            if row_key in rows:
+                rows[row_key]['text'] = evt['text']
+        elif kind == 'reorder':
+            if evt['row'] in ordering:
+                ordering.remove(evt['row'])
+                ordering.insert(evt['idx'], evt['row'])
+        elif kind == 'add':
+            rows[row_key] = {'elapsed_time': 0, 'text': ''}
+            ordering.append(evt['row'])
+        elif kind == 'remove':
+            rows.pop(row_key, None)
+            if evt['row'] in ordering:
+                ordering.remove(evt['row'])
+            if blob['active_row_id'] == evt['row']:
+                blob['active_row_id'] = -1
+
+    blob['timestamp_ms'] = last_t
+    return blob
+
+
+def back_up_unreadable_autosave(snapshot_path):
+    """Moves a snapshot that couldn't be loaded (and its journals) aside, to `<name>.unreadable-<time>.json`,
+    so that a fresh autosave can't overwrite it. Returns the new path, which `load_state` can still read
+    once it's been fixed up."""
+    root, ext = os.path.splitext(snapshot_path)
+    backup_path = f"{root}.unreadable-{time.strftime('%Y%m%d-%H%M%S')}{ext}"
+    for generation in list_journal_generations(snapshot_path):
+        os.replace(journal_path(snapshot_path, generation), journal_path(backup_path, generation))
+    os.replace(snapshot_path, backup_path)
+    return backup_path
+
+
+def load_state(snapshot_path, upto_generation=None):
+    """Loads a snapshot and replays the journals written after it (up to, but not including, the
+    given generation). Returns None if there's no snapshot."""
+    if not os.path.exists(snapshot_path):
+        return None
+    with open(snapshot_path, 'r') as fp:
+        blob = json.load(fp)
+
+    first_generation = int(blob.get('journal_generation', 0))
+    for generation in list_journal_generations(snapshot_path):
+        if generation >= first_generation and (upto_generation is None or generation < upto_generation):
+            replay_events(blob, read_events(journal_path(snapshot_path, generation)))
+
+    if upto_generation is not None:
+        blob['journal_generation'] = upto_generation
+    return blob
+
+
+class Journal:
+    """Append-only log of small state-change events (start, stop, pause, resume, transfer, reset,
+    rename, reorder, add, remove), written next to the snapshot that they apply on top of.
+
+    Events go to `<snapshot>.journal.<generation>.jsonl`. Each snapshot records the first generation
+    that comes after it, so compaction can switch to a new generation immediately and fold the old
+    ones into a new snapshot on the autosave thread, and a crash at any point leaves something
+    loadable behind.
+    """
+
+    def __init__(self, snapshot_path, generation, writer: AutosaveWriter):
+        self.snapshot_path = snapshot_path
+        self.generation = generation
+        self.writer = writer
+        self.size_bytes = 0
+        self._fp = None
+
+    def append(self, kind, **fields):
+        if self._fp is None:
+            self._fp = open(journal_path(self.snapshot_path, self.generation), 'a', encoding='utf-8')
+        line = json.dumps({'t': int(time.time() * 1000), 'e': kind, **fields}) + "\n"
+        self._fp.write(line)
+        self._fp.flush()
+        self.size_bytes += len(line)
+
+        if self.size_bytes > JOURNAL_COMPACT_BYTES:
+            self.compact_in_background()
+
+    def start_new_generation(self):
+        """Directs all further events to a fresh journal file. Returns the new generation."""
+        self.close()
+        self.generation += 1
+        self.size_bytes = 0
+        return self.generation
+
+    def compact_in_background(self):
+        upto_generation = self.start_new_generation()
+        self.writer.request_save(self.snapshot_path, lambda: load_state(self.snapshot_path, upto_generation))
+
+    def sync(self):
+        if self._fp is not None:
+            os.fsync(self._fp.fileno())
+
+    def close(self):
+        if self._fp is not None:
+            self.sync()
+            self._fp.close()
+            self._fp = None
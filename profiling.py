@@ -0,0 +1,190 @@
+import functools
+import json
+import os
+import sys
+import time
+import traceback
+import typing
+
+PROFILE_ENV_VAR = 'TIMEIT_PROFILE'  # set to 1 to profile to a file, or to 'overlay' to just show the stats on screen
+PROFILE_FILE_ENV_VAR = 'TIMEIT_PROFILE_FILE'
+PROFILE_FLAG = '--profile'
+PROFILE_OVERLAY_FLAG = '--profile-overlay'
+
+DEFAULT_PROFILE_FILE = 'timeit_profile.json'
+PROFILE_DUMP_INTERVAL_SECS = 30
+HISTOGRAM_BUCKETS = 26  # log2 buckets of microseconds, the last one catches everything over ~33s
+
+
+def _consume_flag(flag):
+    # (this has to happen before Kivy is imported, or it'll complain about a flag it doesn't know)
+    if flag in sys.argv:
+        sys.argv.remove(flag)
+        return True
+    return False
+
+
+_env_value = os.environ.get(PROFILE_ENV_VAR, '').strip().lower()
+SHOW_OVERLAY = _consume_flag(PROFILE_OVERLAY_FLAG) or _env_value == 'overlay'
+# (the stats are only written out if that was asked for, not when just the overlay was)
+DUMP_STATS = _consume_flag(PROFILE_FLAG) or PROFILE_FILE_ENV_VAR in os.environ or \
+    _env_value not in ('', '0', 'false', 'overlay')
+ENABLED = SHOW_OVERLAY or DUMP_STATS
+
+
+class LatencyHistogram:
+    """Counts of durations in power-of-two microsecond buckets (bucket k holds [2^(k-1), 2^k) us)."""
+
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total_secs = 0.0
+        self.max_secs = 0.0
+
+    def add(self, secs):
+        self.buckets[min(int(secs * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_secs += secs
+        self.max_secs = max(self.max_secs, secs)
+
+    def percentile_us(self, fraction):
+        """An upper bound on the given percentile (i.e. the top of the bucket it falls in)."""
+        threshold = fraction * self.count
+        seen = 0
+        for k, n in enumerate(self.buckets):
+            seen += n
+            if seen >= threshold and seen > 0:
+                return min(2 ** k, self.max_secs * 1e6)
+        return 0
+
+    def to_json(self):
+        return {
+            'count': self.count,
+            'mean_us': self.total_secs * 1e6 / self.count if self.count > 0 else 0,
+            'p50_us': self.percentile_us(0.5),
+            'p90_us': self.percentile_us(0.9),
+            'p99_us': self.percentile_us(0.99),
+            'max_us': self.max_secs * 1e6,
+            'buckets': self.buckets,
+        }
+
+
+class Profiler:
+    """Latency histograms for the functions marked with `@profiled`, plus frame times and how often
+    `Clock.schedule_once` gets called, all of which can be shown in an overlay and dumped to a file."""
+
+    def __init__(self):
+        self.histograms: typing.Dict[str, LatencyHistogram] = {}
+        self.frame_times = LatencyHistogram()
+        self.schedule_once_calls = 0
+        self.schedule_once_per_sec = 0
+        self.max_schedule_once_per_sec = 0
+        self.start_time = time.perf_counter()
+        self._last_frame_time = None
+        self._overlay = None
+
+    def get_histogram(self, name) -> LatencyHistogram:
+        if name not in self.histograms:
+            self.histograms[name] = LatencyHistogram()
+        return self.histograms[name]
+
+    def to_json(self):
+        return {
+            'uptime_secs': time.perf_counter() - self.start_time,
+            'calls': {name: hist.to_json() for name, hist in sorted(self.histograms.items())},
+            'frame_times': self.frame_times.to_json(),
+            'schedule_once_per_sec': self.schedule_once_per_sec,
+            'max_schedule_once_per_sec': self.max_schedule_once_per_sec,
+        }
+
+    def dump(self, filepath):
+        try:
+            with open(filepath, 'w') as fp:
+                json.dump(self.to_json(), fp, indent=2)
+        except Exception:
+            print(f"ERROR: failed to write profiling data to {filepath}")
+            traceback.print_exc()
+
+    def format_summary(self):
+        lines = [f"frame  p50 {self.frame_times.percentile_us(0.5) / 1000:6.1f}ms  "
+                 f"p99 {self.frame_times.percentile_us(0.99) / 1000:6.1f}ms  "
+                 f"max {self.frame_times.max_secs * 1000:6.1f}ms",
+                 f"schedule_once/s {self.schedule_once_per_sec} (max {self.max_schedule_once_per_sec})"]
+        for name, hist in sorted(self.histograms.items()):
+            lines.append(f"{name[-32:]:<32} n={hist.count:<7} p50 {hist.percentile_us(0.5):>8.0f}us  "
+                         f"max {hist.max_secs * 1e6:>8.0f}us")
+        return "\n".join(lines)
+
+    def start(self, clock, window, show_overlay=False, dump_filepath=None):
+        """Hooks into Kivy's clock (and window, for the overlay). Call this once, when the app starts."""
+        clock.schedule_interval(self._on_frame, 0)
+        clock.schedule_interval(self._on_second, 1)
+
+        schedule_once = clock.schedule_once
+
+        def counting_schedule_once(*args, **kwargs):
+            self.schedule_once_calls += 1
+            return schedule_once(*args, **kwargs)
+        clock.schedule_once = counting_schedule_once
+
+        if dump_filepath is not None:
+            clock.schedule_interval(lambda dt: self.dump(dump_filepath), PROFILE_DUMP_INTERVAL_SECS)
+            print(f"INFO: Profiling, writing stats to {os.path.abspath(dump_filepath)}")
+
+        if show_overlay:
+            from kivy.uix.label import Label
+
+            self._overlay = Label(size_hint=(None, None), halign='left', valign='bottom', font_size='11sp',
+                                  color=(1, 1, 1, 0.75))
+            self._overlay.bind(texture_size=self._overlay.setter('size'))
+            # added on the next frame, so it ends up on top of the app's root widget
+            schedule_once(lambda dt: window.add_widget(self._overlay))
+
+    def _on_frame(self, _):
+        now = time.perf_counter()
+        if self._last_frame_time is not None:
+            self.frame_times.add(now - self._last_frame_time)
+        self._last_frame_time = now
+
+    def _on_second(self, _):
+        self.schedule_once_per_sec = self.schedule_once_calls
+        self.max_schedule_once_per_sec = max(self.max_schedule_once_per_sec, self.schedule_once_calls)
+        self.schedule_once_calls = 0
+        if self._overlay is not None:
+            self._overlay.text = self.format_summary()
+
+
+profiler = Profiler()
+
+
+def profiled(name=None):
+    """Records how long each call to the decorated function takes, if profiling is enabled. If it isn't,
+    the function is returned as is, so there's no overhead at all."""
+    def decorator(func):
+        if not ENABLED:
+            return func
+        hist = profiler.get_histogram(name or func.__qualname__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.add(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def get_dump_filepath():
+    """`TIMEIT_PROFILE_FILE` if it's set, otherwise `DEFAULT_PROFILE_FILE` in the app's data directory (or in
+    the current one, if appdirs isn't installed)."""
+    if PROFILE_FILE_ENV_VAR in os.environ:
+        return os.environ[PROFILE_FILE_ENV_VAR]
+    from persistence import get_app_data_dir
+    try:
+        dirpath = get_app_data_dir()
+    except ImportError:
+        return DEFAULT_PROFILE_FILE
+    os.makedirs(dirpath, exist_ok=True)
+    return os.path.join(dirpath, DEFAULT_PROFILE_FILE)
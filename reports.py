@@ -0,0 +1,238 @@
+import argparse
+import datetime
+import os
+import sys
+import typing
+from array import array
+
+from engine import format_time_ms
+from history import IntervalStore, history_path
+
+BUCKETS = ('day', 'week', 'month')
+REMOVED_ACTIVITY_TEXT = "(Removed Activity {0})"
+UNTITLED_ACTIVITY_TEXT = "Untitled Activity"
+REPORT_NAME_WIDTH = 24
+
+
+def bucket_start(t_ms, bucket):
+    """The start of the (local time) day, week or month containing `t_ms`. Weeks start on Monday."""
+    date = datetime.datetime.fromtimestamp(t_ms / 1000).date()
+    if bucket == 'week':
+        date -= datetime.timedelta(days=date.weekday())
+    elif bucket == 'month':
+        date = date.replace(day=1)
+    elif bucket != 'day':
+        raise ValueError(f"Unknown bucket: {bucket}")
+    return int(datetime.datetime(date.year, date.month, date.day).timestamp() * 1000)
+
+
+def next_bucket_start(t_ms, bucket):
+    date = datetime.datetime.fromtimestamp(bucket_start(t_ms, bucket) / 1000).date()
+    if bucket == 'day':
+        date += datetime.timedelta(days=1)
+    elif bucket == 'week':
+        date += datetime.timedelta(days=7)
+    else:
+        date = date.replace(year=date.year + date.month // 12, month=date.month % 12 + 1)
+    return int(datetime.datetime(date.year, date.month, date.day).timestamp() * 1000)
+
+
+def iter_buckets(start_ms, end_ms, bucket) -> typing.Iterator[typing.Tuple[int, int]]:
+    t = bucket_start(start_ms, bucket)
+    while t < end_ms:
+        next_t = next_bucket_start(t, bucket)
+        yield t, next_t
+        t = next_t
+
+
+class ReportIndex:
+    """Prefix sums of interval lengths over an `IntervalStore`, overall and per activity, so the total
+    for any time window is a couple of bisects and a subtraction rather than a scan.
+
+    Only the first & last intervals in a window can stick out of it (intervals don't overlap), so those
+    two get clipped separately. New intervals are folded in lazily, the next time a total is asked for.
+    `get_open_interval` can supply the interval that's still running, as `(row_id, start_ms, end_ms)`.
+    """
+
+    def __init__(self, history: IntervalStore, get_open_interval=None):
+        self.history = history
+        self.get_open_interval = get_open_interval
+        self._prefix = array('q', [0])  # _prefix[k] = total length of the first k intervals
+        self._row_prefix: typing.Dict[int, array] = {}  # same, over each activity's own intervals
+
+    def refresh(self):
+        history = self.history
+        for rec in range(len(self._prefix) - 1, len(history)):
+            length = history.ends[rec] - history.starts[rec]
+            self._prefix.append(self._prefix[-1] + length)
+            row_prefix = self._row_prefix.setdefault(history.row_ids[rec], array('q', [0]))
+            row_prefix.append(row_prefix[-1] + length)
+
+    def _clipped_ms(self, rec, start_ms, end_ms):
+        """How much of an interval lies outside the window."""
+        res = 0
+        if start_ms is not None:
+            res += max(0, start_ms - self.history.starts[rec])
+        if end_ms is not None:
+            res += max(0, self.history.ends[rec] - end_ms)
+        return res
+
+    def total_ms(self, start_ms=None, end_ms=None, row_id=None):
+        self.refresh()
+        history = self.history
+        if row_id is None:
+            lo, hi = history._record_range(start_ms, end_ms)
+            prefix = self._prefix
+            first_rec, last_rec = lo, hi - 1
+        elif row_id in self._row_prefix:
+            positions = history._by_row[row_id]
+            lo, hi = history._row_record_range(positions, start_ms, end_ms)
+            prefix = self._row_prefix[row_id]
+            first_rec, last_rec = (positions[lo], positions[hi - 1]) if hi > lo else (-1, -1)
+        else:
+            lo = hi = 0
+            prefix = self._prefix
+            first_rec = last_rec = -1
+
+        res = 0
+        if hi > lo:
+            res = prefix[hi] - prefix[lo]
+            res -= self._clipped_ms(first_rec, start_ms, None)
+            res -= self._clipped_ms(last_rec, None, end_ms)
+
+        open_interval = self.get_open_interval() if self.get_open_interval is not None else None
+        if open_interval is not None and row_id in (None, open_interval[0]):
+            open_start = open_interval[1] if start_ms is None else max(start_ms, open_interval[1])
+            open_end = open_interval[2] if end_ms is None else min(end_ms, open_interval[2])
+            res += max(0, open_end - open_start)
+        return res
+
+    def get_row_ids(self):
+        res = set(self.history.get_row_ids())
+        open_interval = self.get_open_interval() if self.get_open_interval is not None else None
+        if open_interval is not None:
+            res.add(open_interval[0])
+        return res
+
+    def totals_by_row(self, start_ms=None, end_ms=None, row_ids=None) -> typing.Dict[int, int]:
+        if row_ids is None:
+            row_ids = self.get_row_ids()
+        return {row_id: self.total_ms(start_ms, end_ms, row_id) for row_id in row_ids}
+
+    def bucketed_totals(self, bucket, start_ms, end_ms, row_ids=None) \
+            -> typing.List[typing.Tuple[int, typing.Dict[int, int]]]:
+        """Per-activity totals for each day, week or month that overlaps [start_ms, end_ms)."""
+        if row_ids is None:
+            row_ids = self.get_row_ids()
+        return [(b_start, self.totals_by_row(max(b_start, start_ms), min(b_end, end_ms), row_ids))
+                for b_start, b_end in iter_buckets(start_ms, end_ms, bucket)]
+
+
+def get_activity_name(row_id, names: typing.Dict[int, str]):
+    if row_id not in names:
+        return REMOVED_ACTIVITY_TEXT.format(row_id)
+    return names[row_id] or UNTITLED_ACTIVITY_TEXT
+
+
+def _format_name(name):
+    if len(name) > REPORT_NAME_WIDTH:
+        name = name[:REPORT_NAME_WIDTH - 3] + "..."
+    return name.ljust(REPORT_NAME_WIDTH)
+
+
+def format_summary(index: ReportIndex, names: typing.Dict[int, str], ordering=None, now_ms=None):
+    """A plain text table of each activity's time today, this week and this month."""
+    if now_ms is None:
+        now_ms = int(datetime.datetime.now().timestamp() * 1000)
+    columns = [(bucket.title() if bucket != 'day' else "Today", bucket_start(now_ms, bucket)) for bucket in BUCKETS]
+
+    row_ids = list(ordering if ordering is not None else names)
+    row_ids += sorted(row_id for row_id in index.get_row_ids() if row_id not in names)
+
+    lines = [_format_name("") + "".join(title.rjust(11) for title, _ in columns)]
+    for row_id in row_ids:
+        totals = [index.total_ms(since_ms, now_ms, row_id) for _, since_ms in columns]
+        if any(totals):
+            lines.append(_format_name(get_activity_name(row_id, names)) +
+                         "".join(format_time_ms(ms).rjust(11) for ms in totals))
+    return "\n".join(lines)
+
+
+def format_bucketed(index: ReportIndex, names: typing.Dict[int, str], bucket, start_ms, end_ms):
+    lines = []
+    for b_start, totals in index.bucketed_totals(bucket, start_ms, end_ms):
+        totals = {row_id: ms for row_id, ms in totals.items() if ms > 0}
+        if len(totals) > 0:
+            lines.append(datetime.datetime.fromtimestamp(b_start / 1000).strftime("%Y-%m-%d"))
+            for row_id, ms in sorted(totals.items(), key=lambda item: -item[1]):
+                lines.append("  " + _format_name(get_activity_name(row_id, names)) + format_time_ms(ms).rjust(11))
+    return "\n".join(lines)
+
+
+def parse_date_ms(text):
+    """`YYYY-MM-DD` -> the start of that (local time) day."""
+    return int(datetime.datetime.strptime(text, "%Y-%m-%d").timestamp() * 1000)
+
+
+def parse_date_range(from_date=None, to_date=None, history: IntervalStore = None):
+    """Turns inclusive `YYYY-MM-DD` dates (either may be None) into a [start_ms, end_ms) window."""
+    now_ms = int(datetime.datetime.now().timestamp() * 1000)
+    if from_date is not None:
+        start_ms = parse_date_ms(from_date)
+    else:
+        start_ms = history.starts[0] if history is not None and len(history) > 0 else now_ms
+    end_ms = next_bucket_start(parse_date_ms(to_date), 'day') if to_date is not None else now_ms
+    return start_ms, end_ms
+
+
+def load_saved_state(filepath):
+    """Loads an autosave (without its history). Returns `(blob, names)`."""
+    from persistence import load_state
+
+    blob = load_state(filepath)
+    names = {int(row_id): row['text'] for row_id, row in blob['row_lookup'].items()}
+    return blob, names
+
+
+def get_saved_open_interval(blob):
+    """The interval that was still running when the autosave was written, up until now, or None."""
+    if str(blob['active_row_id']) in blob['row_lookup'] and blob.get('active_since_ms', -1) >= 0:
+        return blob['active_row_id'], blob['active_since_ms'], int(datetime.datetime.now().timestamp() * 1000)
+    return None
+
+
+def load_saved_history(filepath):
+    """Loads an autosave and its history for reporting. Returns `(blob, names, index)`."""
+    blob, names = load_saved_state(filepath)
+    history = IntervalStore.load(history_path(filepath))
+    return blob, names, ReportIndex(history, lambda: get_saved_open_interval(blob))
+
+
+def main(argv=None):
+    from persistence import get_default_autosave_filepath
+
+    parser = argparse.ArgumentParser(description="Prints how much time was spent on each TimeIt activity.")
+    parser.add_argument('--file', default=None, help="the autosave file to report on (default: TimeIt's own)")
+    parser.add_argument('--by', choices=BUCKETS, default=None,
+                        help="print totals for each day, week or month (default: a summary of today, this week "
+                             "& this month)")
+    parser.add_argument('--from', dest='from_date', default=None, help="first date to include, as YYYY-MM-DD")
+    parser.add_argument('--to', dest='to_date', default=None, help="last date to include, as YYYY-MM-DD")
+    args = parser.parse_args(argv)
+
+    filepath = args.file or get_default_autosave_filepath(and_create=False)
+    if filepath is None or not os.path.exists(filepath):
+        print(f"ERROR: no autosave file found at {filepath}")
+        return 1
+
+    blob, names, index = load_saved_history(filepath)
+    if args.by is None and args.from_date is None and args.to_date is None:
+        print(format_summary(index, names, ordering=blob['row_ordering']))
+    else:
+        start_ms, end_ms = parse_date_range(args.from_date, args.to_date, index.history)
+        print(format_bucketed(index, names, args.by or 'day', start_ms, end_ms))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# the app's modules live in the repo root (appended rather than prepended, since timeit.py would otherwise
+# shadow the stdlib module of the same name)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
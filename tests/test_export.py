@@ -0,0 +1,86 @@
+import csv
+import json
+
+import pytest
+
+import export
+from export import INTERVAL_FIELDS, TOTAL_FIELDS, export_rows, get_export_format, iter_interval_rows, \
+    iter_intervals, iter_total_rows, resolve_activities
+from history import IntervalStore, MappedHistory, history_path
+
+NAMES = {1: "Writing", 2: "Coding"}
+
+
+@pytest.fixture
+def history_file(tmp_path):
+    filepath = str(tmp_path / "h.history.bin")
+    store = IntervalStore()
+    for row_id, start, end in [(1, 0, 1000), (2, 1000, 3000), (1, 5000, 6000), (3, 7000, 7500)]:
+        store.append(row_id, start, end)
+    store.save(filepath)
+    return filepath
+
+
+def test_iter_intervals(history_file):
+    with MappedHistory(history_file) as history:
+        assert list(iter_intervals(history, 500, 5500)) == [(1, 500, 1000), (2, 1000, 3000), (1, 5000, 5500)]
+        assert list(iter_intervals(history, row_ids={1})) == [(1, 0, 1000), (1, 5000, 6000)]
+
+        # the running interval comes last, clipped to the window like the rest
+        intervals = list(iter_intervals(history, 0, 9000, open_interval=(2, 8000, 10000)))
+        assert intervals[-1] == (2, 8000, 9000)
+        assert list(iter_intervals(history, 0, 8000, open_interval=(2, 8000, 10000)))[-1] == (3, 7000, 7500)
+        assert list(iter_intervals(history, row_ids={1}, open_interval=(2, 8000, 10000)))[-1] == (1, 5000, 6000)
+
+
+def test_rows(history_file):
+    with MappedHistory(history_file) as history:
+        rows = list(iter_interval_rows(iter_intervals(history), NAMES))
+        assert [row[0:2] for row in rows] == [(1, "Writing"), (2, "Coding"), (1, "Writing"), (3, "(Removed Activity 3)")]
+        assert rows[1][4:] == (1000, 3000, 2000)
+        assert all(len(row) == len(INTERVAL_FIELDS) for row in rows)
+
+        totals = list(iter_total_rows(iter_intervals(history, open_interval=(2, 8000, 10000)), NAMES))
+        assert totals == [(1, "Writing", "0:00:02", 2000), (2, "Coding", "0:00:04", 4000),
+                          (3, "(Removed Activity 3)", "0:00:00", 500)]
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl'])
+def test_export_rows_round_trip(tmp_path, monkeypatch, fmt):
+    monkeypatch.setattr(export, 'EXPORT_CHUNK_ROWS', 3)  # so the rows span a few chunks
+    rows = [(i, f"Activity {i}", "0:00:01", 1000 * i) for i in range(10)]
+    filepath = str(tmp_path / f"out.{fmt}")
+    assert export_rows(filepath, iter(rows), TOTAL_FIELDS) == 10
+
+    with open(filepath, encoding='utf-8', newline='') as fp:
+        if fmt == 'csv':
+            records = list(csv.DictReader(fp))
+        else:
+            records = [json.loads(line) for line in fp]
+    assert [record['activity'] for record in records] == [row[1] for row in rows]
+    assert [int(record['total_ms']) for record in records] == [row[3] for row in rows]
+
+
+def test_export_format_and_activities():
+    assert get_export_format("a/b.CSV") == 'csv'
+    with pytest.raises(ValueError):
+        get_export_format("b.txt")
+    assert resolve_activities(NAMES, None) is None
+    assert resolve_activities(NAMES, [" writing ", "7"]) == {1, 7}
+
+
+def test_main(tmp_path):
+    filepath = str(tmp_path / "autosave.json")
+    with open(filepath, 'w') as fp:
+        json.dump({'row_lookup': {'1': {'text': 'Writing', 'elapsed_time': 0}}, 'row_ordering': [1],
+                   'active_row_id': -1, 'active_since_ms': -1, 'timestamp_ms': 0}, fp)
+    store = IntervalStore()
+    store.append(1, 1000, 2000)
+    store.save(history_path(filepath))
+
+    output = str(tmp_path / "out.jsonl")
+    assert export.main([output, '--file', filepath, '--what', 'totals']) == 0
+    with open(output) as fp:
+        assert [json.loads(line) for line in fp] == [
+            {'activity_id': 1, 'activity': 'Writing', 'total': '0:00:01', 'total_ms': 1000}]
+    assert export.main([output, '--file', str(tmp_path / "missing.json")]) == 1
@@ -0,0 +1,118 @@
+import os
+from array import array
+
+import pytest
+
+from history import HISTORY_HEADER_SIZE, HISTORY_RECORD_SIZE, IntervalStore, MappedHistory, history_path
+
+
+def make_store():
+    res = IntervalStore()
+    for row_id, start, end in [(1, 0, 10), (2, 10, 25), (1, 30, 40), (3, 50, 55), (2, 60, 100)]:
+        res.append(row_id, start, end)
+    return res
+
+
+def columns(store):
+    return list(store.starts), list(store.ends), list(store.row_ids)
+
+
+def test_append_clamps_and_skips_empty():
+    res = IntervalStore()
+    res.append(1, 100, 200)
+    res.append(2, 150, 300)  # the clock went back
+    res.append(3, 300, 300)
+    assert columns(res) == ([100, 200], [200, 300], [1, 2])
+
+
+def test_query_clips_to_window():
+    store = make_store()
+    assert list(store.query(5, 35)) == [(1, 5, 10), (2, 10, 25), (1, 30, 35)]
+    assert list(store.query(5, 35, row_id=1)) == [(1, 5, 10), (1, 30, 35)]
+    assert list(store.query(41, 49)) == []
+    assert store.total_ms() == 10 + 15 + 10 + 5 + 40
+    assert store.totals_by_row(0, 70) == {1: 20, 2: 25, 3: 5}
+
+
+def test_from_columns_sorts_and_trims_overlaps():
+    res = IntervalStore.from_columns(array('q', [50, 0, 5]), array('q', [60, 10, 20]), array('q', [3, 1, 2]))
+    assert columns(res) == ([0, 10, 50], [10, 20, 60], [1, 2, 3])
+
+
+def test_save_load_round_trip(tmp_path):
+    filepath = str(tmp_path / "h.history.bin")
+    store = make_store()
+    store.save(filepath)
+    assert os.path.getsize(filepath) == HISTORY_HEADER_SIZE + len(store) * HISTORY_RECORD_SIZE
+
+    loaded = IntervalStore.load(filepath)
+    assert columns(loaded) == columns(store)
+    assert list(loaded.query(5, 35, row_id=1)) == list(store.query(5, 35, row_id=1))
+
+
+def test_attach_appends_to_the_file(tmp_path):
+    filepath = str(tmp_path / "h.history.bin")
+    store = IntervalStore.load(filepath)
+    store.attach(filepath)
+    store.append(1, 0, 10)
+    store.append(2, 10, 20)
+    store.detach()
+    assert columns(IntervalStore.load(filepath)) == ([0, 10], [10, 20], [1, 2])
+
+
+def test_torn_tail(tmp_path):
+    filepath = str(tmp_path / "h.history.bin")
+    make_store().save(filepath)
+    with open(filepath, 'ab') as fp:
+        fp.write(b"\x01" * (HISTORY_RECORD_SIZE // 2))
+    torn_size = os.path.getsize(filepath)
+
+    # readers skip the partial record, without touching the file
+    assert len(IntervalStore.load(filepath)) == 5
+    with MappedHistory(filepath) as mapped:
+        assert len(mapped) == 5
+    assert os.path.getsize(filepath) == torn_size
+
+    # and attaching to it cuts it off, so new records line up again
+    store = IntervalStore.load(filepath)
+    store.attach(filepath)
+    store.append(4, 200, 300)
+    store.detach()
+    assert list(IntervalStore.load(filepath).row_ids) == [1, 2, 1, 3, 2, 4]
+
+
+def test_not_a_history_file(tmp_path):
+    filepath = str(tmp_path / "h.history.bin")
+    with open(filepath, 'wb') as fp:
+        fp.write(b"something else entirely")
+    with pytest.raises(ValueError):
+        IntervalStore.load(filepath)
+    with pytest.raises(ValueError):
+        MappedHistory(filepath)
+
+
+def test_mapped_history_matches_the_store(tmp_path):
+    filepath = str(tmp_path / "h.history.bin")
+    store = make_store()
+    store.save(filepath)
+    with MappedHistory(filepath) as mapped:
+        assert list(mapped.starts) == list(store.starts)
+        for window in [(None, None), (5, 35), (41, 49), (0, 1000), (99, None)]:
+            assert list(mapped.query(*window)) == list(store.query(*window))
+
+    with MappedHistory(str(tmp_path / "missing.history.bin")) as mapped:
+        assert len(mapped) == 0 and list(mapped.query()) == []
+
+
+def test_mapped_history_closes_with_a_query_left_open(tmp_path):
+    filepath = str(tmp_path / "h.history.bin")
+    make_store().save(filepath)
+    with pytest.raises(RuntimeError, match="disk full"):
+        with MappedHistory(filepath) as mapped:
+            query = mapped.query()
+            next(query)
+            raise RuntimeError("disk full")
+
+
+def test_history_path():
+    assert history_path(os.path.join("a", "autosave.json")) == os.path.join("a", "autosave.history.bin")
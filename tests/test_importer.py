@@ -0,0 +1,125 @@
+import datetime
+import json
+import queue
+
+import pytest
+
+from engine import TimerEngine
+from importer import ColumnMapping, Importer, parse_duration_ms, parse_timestamp_ms, read_import_file
+
+
+def local_ms(*args):
+    return int(datetime.datetime(*args).timestamp() * 1000)
+
+
+def write(tmp_path, filename, text):
+    filepath = str(tmp_path / filename)
+    with open(filepath, 'w', encoding='utf-8') as fp:
+        fp.write(text)
+    return filepath
+
+
+def test_guess():
+    res = ColumnMapping.guess(["Task", "Started", "Stopped"])
+    assert (res.activity, res.start, res.end, res.duration) == ('task', 'started', 'stopped', None)
+    res = ColumnMapping.guess(["Project", "Start date", "Start time", "End date", "End time", "Duration"])
+    assert (res.activity, res.start, res.end, res.duration) == \
+        ('project', ('start date', 'start time'), ('end date', 'end time'), 'duration')
+    with pytest.raises(ValueError):
+        ColumnMapping.guess(["start", "end"])
+    with pytest.raises(ValueError):
+        ColumnMapping.guess(["activity", "start"])
+
+
+@pytest.mark.parametrize('value, expected', [
+    ("1704447000", 1704447000000),
+    ("1704447000000", 1704447000000),
+    ("2024-01-05T09:30:00", local_ms(2024, 1, 5, 9, 30)),
+    ("2024-01-05 09:30:00", local_ms(2024, 1, 5, 9, 30)),
+    ("2024-01-05T09:30:00Z", 1704447000000),
+    ("01/05/2024 09:30:00 PM", local_ms(2024, 1, 5, 21, 30)),
+    ("05.01.2024 09:30", local_ms(2024, 1, 5, 9, 30)),
+])
+def test_parse_timestamp(value, expected):
+    assert parse_timestamp_ms(value) == expected
+
+
+def test_parse_timestamp_rejects_junk():
+    with pytest.raises(ValueError):
+        parse_timestamp_ms("yesterday")
+
+
+@pytest.mark.parametrize('value, column, expected', [
+    ("1:30:00", 'duration', 90 * 60 * 1000),
+    ("1:30", 'duration', 90 * 60 * 1000),
+    ("90", 'duration', 90 * 1000),
+    ("1500", 'duration_ms', 1500),
+    ("1.5", 'hours', 90 * 60 * 1000),
+    ("1.50", 'duration (decimal)', 90 * 60 * 1000),
+    ("2", 'minutes', 2 * 60 * 1000),
+])
+def test_parse_duration(value, column, expected):
+    assert parse_duration_ms(value, column) == expected
+
+
+def test_toggl_csv(tmp_path):
+    filepath = write(tmp_path, "toggl.csv",
+                     "\ufeffUser,Project,Description,Start date,Start time,End date,End time,Duration\n"
+                     "Me,Writing,draft,2024-01-05,09:30:00,2024-01-05,11:00:00,01:30:00\n"
+                     "Me,Coding,bug,2024-01-05,23:30:00,2024-01-06,00:15:00,00:45:00\n"
+                     "Me,Coding,bug,junk,junk,,,00:10:00\n"
+                     "Me,Coding,bug,junk,junk,,,\n")
+    res = read_import_file(filepath)
+    assert res.names == ["Writing", "Coding"]
+    assert list(res.starts) == [local_ms(2024, 1, 5, 9, 30), local_ms(2024, 1, 5, 23, 30)]
+    assert list(res.ends) == [local_ms(2024, 1, 5, 11), local_ms(2024, 1, 6, 0, 15)]
+    # the row without a readable start still counts, by its duration
+    assert list(res.totals_ms) == [90 * 60 * 1000, 55 * 60 * 1000]
+    assert list(res.untimed_ms) == [0, 10 * 60 * 1000]
+    assert (res.num_rows, res.num_skipped) == (4, 1)
+
+
+def test_clockify_csv(tmp_path):
+    filepath = write(tmp_path, "clockify.csv",
+                     "Project,Description,Start Date,Start Time,End Date,End Time,Duration (h),Duration (decimal)\n"
+                     "Writing,draft,01/05/2024,09:30:00 AM,01/05/2024,11:00:00 AM,01:30:00,1.50\n")
+    res = read_import_file(filepath)
+    assert list(res.starts) == [local_ms(2024, 1, 5, 9, 30)]
+    assert list(res.totals_ms) == [90 * 60 * 1000]
+
+
+def test_jsonl_with_different_keys(tmp_path):
+    filepath = write(tmp_path, "history.jsonl", "\n".join(json.dumps(record) for record in [
+        {"activity": "A", "start_ms": 1000000000000, "end_ms": 1000000060000},
+        {"Task": "B", "Duration_ms": 5000},
+        {"activity": "A", "start": "2001-09-09T01:46:40Z", "duration": "0:01"},
+        {"nothing": "useful"},
+    ]) + "\n")
+    res = read_import_file(filepath)
+    assert res.names == ["A", "B"]
+    assert list(res.totals_ms) == [120000, 5000]
+    assert list(res.starts) == [1000000000000, 1000000000000]
+    assert (res.num_rows, res.num_skipped) == (4, 1)
+
+
+def test_import_totals_match_the_merged_history(tmp_path):
+    engine = TimerEngine()
+    row = engine.add_row("Writing")
+    engine.history.append(row.row_id, 1000000, 2000000)
+    row.set_time_ms(1000000)
+
+    filepath = write(tmp_path, "overlapping.csv", "activity,start_ms,end_ms,duration_ms\n"
+                                                  "writing,1500000000000,1500000001000,\n"
+                                                  "Coding,1500000000500,1500000002000,\n"
+                                                  "Coding,,,60000\n")
+    results = []
+    ui_calls = queue.Queue()
+    Importer(engine, filepath, run_on_ui=ui_calls.put, on_done=results.append).start()
+    while not results:
+        ui_calls.get(timeout=5)()
+
+    assert results[0] is not None and results[0].trimmed_ms == 500
+    history_totals = engine.history.totals_by_row()
+    coding = next(row_id for row_id, row in engine.row_lookup.items() if row.text == "Coding")
+    assert engine.row_lookup[row.row_id].get_time_ms() == history_totals[row.row_id]
+    assert engine.row_lookup[coding].get_time_ms() == history_totals[coding] + 60000
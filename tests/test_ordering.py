@@ -0,0 +1,89 @@
+import random
+
+import pytest
+
+import ordering
+from ordering import RowOrdering
+
+
+def check(res: RowOrdering, expected):
+    assert list(res) == expected
+    assert len(res) == len(expected)
+    for idx, row_id in enumerate(expected):
+        assert res[idx] == row_id
+        assert res.index(row_id) == idx
+
+
+def test_list_operations():
+    res = RowOrdering([3, 1, 2])
+    check(res, [3, 1, 2])
+    assert res[-1] == 2
+    assert 1 in res and 4 not in res
+
+    res.append(4)
+    res.insert(0, 5)
+    res.insert(-1, 6)
+    res.remove(1)
+    check(res, [5, 3, 2, 6, 4])
+
+    with pytest.raises(IndexError):
+        res[5]
+    with pytest.raises(ValueError):
+        res.index(1)
+    with pytest.raises(ValueError):
+        res.remove(1)
+
+
+@pytest.mark.parametrize('block_load', [1, 2, 4, ordering.BLOCK_LOAD])
+def test_matches_a_list(monkeypatch, block_load):
+    # small blocks, so that splitting & merging them gets exercised
+    monkeypatch.setattr(ordering, 'BLOCK_LOAD', block_load)
+    rand = random.Random(block_load)
+    expected = list(range(rand.randint(0, 40)))
+    res = RowOrdering(expected)
+    next_id = len(expected)
+
+    for _ in range(500):
+        op = rand.random()
+        if op < 0.3:
+            res.append(next_id)
+            expected.append(next_id)
+            next_id += 1
+        elif op < 0.5 and expected:
+            row_id = rand.choice(expected)
+            res.remove(row_id)
+            expected.remove(row_id)
+        elif op < 0.8 and expected:
+            # a move, like dragging a row
+            row_id, idx = rand.choice(expected), rand.randrange(len(expected))
+            res.remove(row_id)
+            expected.remove(row_id)
+            res.insert(idx, row_id)
+            expected.insert(idx, row_id)
+        else:
+            idx = rand.randint(0, len(expected) + 2)
+            res.insert(idx, next_id)
+            expected.insert(idx, next_id)
+            next_id += 1
+        assert list(res) == expected
+    check(res, expected)
+
+
+def test_repeated_inserts_in_one_spot():
+    res = RowOrdering(range(1000))
+    expected = list(range(1000))
+    for _ in range(2000):
+        row_id = expected.pop()
+        res.remove(row_id)
+        res.insert(1, row_id)
+        expected.insert(1, row_id)
+    check(res, expected)
+
+
+def test_churn_stays_small():
+    res = RowOrdering(range(10))
+    for row_id in range(100, 10100):
+        res.append(row_id)
+        res.remove(row_id)
+    check(res, list(range(10)))
+    assert len(res._blocks) == 1
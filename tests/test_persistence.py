@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+from persistence import AutosaveWriter, Journal, back_up_unreadable_autosave, journal_path, \
+    list_journal_generations, load_state, next_journal_generation, replay_events, write_json_atomic, \
+    write_snapshot
+
+
+def make_blob(**fields):
+    res = {
+        'row_lookup': {'0': {'elapsed_time': 1000, 'text': 'A'}, '1': {'elapsed_time': 0, 'text': 'B'}},
+        'row_ordering': [0, 1],
+        'active_row_id': -1,
+        'active_since_ms': -1,
+        'timestamp_ms': 10000,
+    }
+    res.update(fields)
+    return res
+
+
+def write_events(path, events, torn_line=None):
+    with open(path, 'w', encoding='utf-8') as fp:
+        for evt in events:
+            fp.write(json.dumps(evt) + "\n")
+        if torn_line is not None:
+            fp.write(torn_line)
+
+
+def test_replay_events():
+    blob = replay_events(make_blob(), [
+        {'t': 11000, 'e': 'start', 'row': 1},
+        {'t': 14000, 'e': 'transfer', 'row': 0, 'src': 1, 'ms': 500},
+        {'t': 15000, 'e': 'stop'},
+        {'t': 16000, 'e': 'add', 'row': 2},
+        {'t': 16000, 'e': 'rename', 'row': 2, 'text': 'C'},
+        {'t': 17000, 'e': 'reorder', 'row': 2, 'idx': 0},
+        {'t': 18000, 'e': 'reset', 'row': 0},
+        {'t': 19000, 'e': 'remove', 'row': 1},
+    ])
+    assert blob['row_lookup'] == {'0': {'elapsed_time': 0, 'text': 'A'}, '2': {'elapsed_time': 0, 'text': 'C'}}
+    assert blob['row_ordering'] == [2, 0]
+    assert blob['active_row_id'] == -1
+    assert blob['timestamp_ms'] == 19000
+
+
+def test_replay_credits_the_running_row():
+    blob = replay_events(make_blob(), [{'t': 11000, 'e': 'start', 'row': 1}, {'t': 13500, 'e': 'pause', 'row': 1}])
+    assert blob['row_lookup']['1']['elapsed_time'] == 2500
+    assert (blob['active_row_id'], blob['active_since_ms']) == (-1, -1)
+
+
+def test_load_state_replays_newer_journals(tmp_path):
+    snapshot_path = str(tmp_path / "autosave.json")
+    write_json_atomic(snapshot_path, make_blob(journal_generation=2))
+    write_events(journal_path(snapshot_path, 1), [{'t': 10000, 'e': 'rename', 'row': 0, 'text': 'old'}])
+    write_events(journal_path(snapshot_path, 2), [{'t': 10000, 'e': 'rename', 'row': 0, 'text': 'X'}])
+    write_events(journal_path(snapshot_path, 3), [{'t': 10000, 'e': 'rename', 'row': 1, 'text': 'Y'}],
+                 torn_line='{"t": 10000, "e": "rena')
+
+    blob = load_state(snapshot_path)
+    assert [row['text'] for row in blob['row_lookup'].values()] == ['X', 'Y']
+    assert load_state(snapshot_path, upto_generation=3)['row_lookup']['1']['text'] == 'B'
+    assert next_journal_generation(snapshot_path) == 4
+    assert load_state(str(tmp_path / "missing.json")) is None
+
+
+def test_write_snapshot_deletes_obsolete_journals(tmp_path):
+    snapshot_path = str(tmp_path / "autosave.json")
+    for generation in (1, 2, 3):
+        write_events(journal_path(snapshot_path, generation), [])
+    write_snapshot(snapshot_path, make_blob(journal_generation=3))
+    assert list_journal_generations(snapshot_path) == [3]
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_journal_round_trip(tmp_path):
+    snapshot_path = str(tmp_path / "autosave.json")
+    write_snapshot(snapshot_path, make_blob(journal_generation=1))
+    writer = AutosaveWriter()
+    journal = Journal(snapshot_path, next_journal_generation(snapshot_path), writer)
+    journal.append('rename', row=1, text='renamed')
+    journal.append('add', row=5)
+
+    journal.compact_in_background()
+    assert writer.flush(timeout=5)
+    journal.append('reorder', row=5, idx=0)
+    journal.close()
+
+    with open(snapshot_path) as fp:
+        assert json.load(fp)['row_ordering'] == [0, 1, 5]
+    blob = load_state(snapshot_path)
+    assert blob['row_lookup']['1']['text'] == 'renamed'
+    assert blob['row_ordering'] == [5, 0, 1]
+
+
+def test_back_up_unreadable_autosave(tmp_path):
+    snapshot_path = str(tmp_path / "autosave.json")
+    with open(snapshot_path, 'w') as fp:
+        fp.write(json.dumps(make_blob(journal_generation=2))[:-1])  # (unreadable, missing its last brace)
+    write_events(journal_path(snapshot_path, 2), [{'t': 10000, 'e': 'rename', 'row': 0, 'text': 'X'}])
+    with pytest.raises(ValueError):
+        load_state(snapshot_path)
+
+    backup_path = back_up_unreadable_autosave(snapshot_path)
+    assert not os.path.exists(snapshot_path) and list_journal_generations(snapshot_path) == []
+
+    # the backup keeps its journals, so it loads once it's been fixed
+    with open(backup_path, 'a') as fp:
+        fp.write("}")
+    assert load_state(backup_path)['row_lookup']['0']['text'] == 'X'
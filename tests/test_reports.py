@@ -0,0 +1,110 @@
+import datetime
+import json
+import os
+import random
+
+import pytest
+
+from history import IntervalStore, history_path
+from reports import ReportIndex, bucket_start, format_bucketed, format_summary, get_activity_name, \
+    load_saved_history, next_bucket_start, parse_date_ms, parse_date_range
+
+HOUR_MS = 60 * 60 * 1000
+
+
+def local_ms(*args):
+    return int(datetime.datetime(*args).timestamp() * 1000)
+
+
+def random_history(seed=0, n=300):
+    rand = random.Random(seed)
+    res = IntervalStore()
+    t = local_ms(2024, 1, 1)
+    for _ in range(n):
+        t += rand.randint(0, HOUR_MS)
+        length = rand.randint(1, 3 * HOUR_MS)
+        res.append(rand.randint(0, 4), t, t + length)
+        t += length
+    return res
+
+
+def test_totals_match_a_scan():
+    history = random_history()
+    index = ReportIndex(history)
+    rand = random.Random(1)
+    first, last = history.starts[0], history.ends[-1]
+    for _ in range(200):
+        start_ms, end_ms = sorted(rand.randint(first - HOUR_MS, last + HOUR_MS) for _ in range(2))
+        for row_id in (None, 0, 3, 99):
+            assert index.total_ms(start_ms, end_ms, row_id) == history.total_ms(start_ms, end_ms, row_id)
+    assert index.total_ms() == history.total_ms()
+
+
+def test_new_intervals_and_the_open_one_are_counted():
+    history = IntervalStore()
+    history.append(1, 0, 100)
+    index = ReportIndex(history, get_open_interval=lambda: (2, 500, 800))
+    assert index.total_ms() == 400
+    history.append(1, 200, 300)
+    assert index.totals_by_row() == {1: 200, 2: 300}
+    assert index.total_ms(250, 600, row_id=2) == 100
+    assert index.get_row_ids() == {1, 2}
+
+
+def test_buckets():
+    t = local_ms(2024, 2, 29, 15, 30)  # a Thursday
+    assert bucket_start(t, 'day') == local_ms(2024, 2, 29)
+    assert bucket_start(t, 'week') == local_ms(2024, 2, 26)
+    assert bucket_start(t, 'month') == local_ms(2024, 2, 1)
+    assert next_bucket_start(t, 'month') == local_ms(2024, 3, 1)
+    assert next_bucket_start(local_ms(2024, 12, 5), 'month') == local_ms(2025, 1, 1)
+    with pytest.raises(ValueError):
+        bucket_start(t, 'year')
+
+
+def test_bucketed_totals_add_up():
+    history = random_history()
+    index = ReportIndex(history)
+    start_ms, end_ms = history.starts[0], history.ends[-1]
+    buckets = index.bucketed_totals('day', start_ms, end_ms)
+    assert sum(sum(totals.values()) for _, totals in buckets) == history.total_ms()
+    assert format_bucketed(index, {0: "Zero"}, 'week', start_ms, end_ms).startswith("2024-01-01")
+
+
+def test_format_summary():
+    now_ms = local_ms(2024, 3, 6, 12)  # a Wednesday
+    history = IntervalStore()
+    history.append(7, now_ms - 2 * 24 * HOUR_MS, now_ms - 2 * 24 * HOUR_MS + HOUR_MS)
+    history.append(0, now_ms - 2 * HOUR_MS, now_ms - HOUR_MS)
+    lines = format_summary(ReportIndex(history), {0: "Writing", 1: "Unused"}, now_ms=now_ms).split("\n")
+    assert lines[0].split() == ["Today", "Week", "Month"]
+    assert lines[1].split() == ["Writing", "1:00:00", "1:00:00", "1:00:00"]
+    assert lines[2].split() == ["(Removed", "Activity", "7)", "0:00:00", "1:00:00", "1:00:00"]
+    assert len(lines) == 3
+
+
+def test_names_and_dates():
+    assert get_activity_name(1, {1: "A"}) == "A"
+    assert get_activity_name(1, {1: ""}) == "Untitled Activity"
+    assert get_activity_name(2, {}) == "(Removed Activity 2)"
+    assert parse_date_range("2024-01-01", "2024-01-02") == (parse_date_ms("2024-01-01"), local_ms(2024, 1, 3))
+    history = random_history(n=3)
+    assert parse_date_range(None, "2024-01-02", history)[0] == history.starts[0]
+
+
+def test_load_saved_history_only_reads(tmp_path):
+    filepath = str(tmp_path / "autosave.json")
+    with open(filepath, 'w') as fp:
+        json.dump({'row_lookup': {'0': {'text': 'A', 'elapsed_time': 0}}, 'row_ordering': [0],
+                   'active_row_id': 0, 'active_since_ms': 1000, 'timestamp_ms': 1000}, fp)
+    history = IntervalStore()
+    history.append(0, 0, 500)
+    history.save(history_path(filepath))
+    with open(history_path(filepath), 'ab') as fp:
+        fp.write(b"\x00" * 5)  # as if the app were part way through appending a record
+    size = os.path.getsize(history_path(filepath))
+
+    blob, names, index = load_saved_history(filepath)
+    assert names == {0: 'A'}
+    assert index.total_ms(0, 2000) == 500 + 1000  # (including the timer that's still running)
+    assert os.path.getsize(history_path(filepath)) == size
@@ -0,0 +1,45 @@
+import pytest
+
+from timeexpr import MAX_EXPRESSION_LENGTH, MAX_NESTING_DEPTH, clock_to_minutes, eval_time_expr
+
+
+@pytest.mark.parametrize('text, expected', [('1:20', 80), (':45', 45), ('1:20:30', 80.5), ('0:05', 5)])
+def test_clock_to_minutes(text, expected):
+    assert clock_to_minutes(text) == expected
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('45', 45),
+    ('45.5 + 1:20 + 30 / 2', 140.5),
+    ('2 * (3 + 4)', 14),
+    ('-5 + 10', 5),
+    ('--5', 5),
+    ('+.5', 0.5),
+    ('1:00 - :15', 45),
+    ('  10 *2  ', 20),
+])
+def test_eval(expression, expected):
+    assert eval_time_expr(expression) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('expression', ['', '1 +', '(1', '1)', '1 2', 'abs(1)', '__import__("os")', '1 ** 2', '1 / 0'])
+def test_invalid(expression):
+    with pytest.raises(ValueError):
+        eval_time_expr(expression)
+
+
+def test_nesting_limit():
+    assert eval_time_expr("(" * MAX_NESTING_DEPTH + "1" + ")" * MAX_NESTING_DEPTH) == 1
+    with pytest.raises(ValueError):
+        eval_time_expr("(" * (MAX_NESTING_DEPTH + 1) + "1" + ")" * (MAX_NESTING_DEPTH + 1))
+    with pytest.raises(ValueError):
+        eval_time_expr("-" * (MAX_NESTING_DEPTH + 2) + "1")
+
+
+def test_length_limit():
+    ones = (MAX_EXPRESSION_LENGTH + 1) // 2
+    expression = "+".join(["1"] * ones)  # (the longest sum of ones that fits)
+    assert len(expression) <= MAX_EXPRESSION_LENGTH
+    assert eval_time_expr(expression) == ones
+    with pytest.raises(ValueError, match="too long"):
+        eval_time_expr(expression + "+1")
@@ -0,0 +1,143 @@
+import functools
+import operator
+import re
+import typing
+
+COMPILE_CACHE_SIZE = 256
+MAX_EXPRESSION_LENGTH = 256
+MAX_NESTING_DEPTH = 32
+
+# a clock literal (`h:mm`, `:mm` or `h:mm:ss`), a plain number, or a single-character operator
+TOKEN_PATTERN = re.compile(r"\s*(?:(\d*:\d+(?::\d+)?)|(\d+\.?\d*|\.\d+)|([-+*/()]))")
+
+BINARY_OPS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+}
+
+
+def clock_to_minutes(text):
+    """`1:20` -> 80, `:45` -> 45, `1:20:30` -> 80.5"""
+    parts = text.split(":")
+    hours = int(parts[0]) if parts[0] else 0
+    res = hours * 60 + int(parts[1])
+    if len(parts) > 2:
+        res += int(parts[2]) / 60
+    return res
+
+
+def tokenize(expression) -> typing.List[typing.Tuple[str, typing.Union[float, str]]]:
+    res = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = TOKEN_PATTERN.match(expression, pos)
+        if match is None:
+            raise ValueError(f"Illegal expression: {expression}")
+        clock, number, op = match.groups()
+        if clock is not None:
+            res.append(('num', float(clock_to_minutes(clock))))
+        elif number is not None:
+            res.append(('num', float(number)))
+        else:
+            res.append(('op', op))
+        pos = match.end()
+    return res
+
+
+class _Parser:
+    """Recursive descent over the tokens, producing an AST of nested tuples:
+    `('num', value)`, `('neg', node)` or `(op, left, right)`."""
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.pos = 0
+
+    def error(self):
+        return ValueError(f"Illegal expression: {self.expression}")
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def parse(self):
+        node = self.parse_sum(0)
+        if self.pos != len(self.tokens):
+            raise self.error()
+        return node
+
+    def parse_sum(self, depth):
+        node = self.parse_product(depth)
+        while self.peek() in (('op', '+'), ('op', '-')):
+            op = self.tokens[self.pos][1]
+            self.pos += 1
+            node = (op, node, self.parse_product(depth))
+        return node
+
+    def parse_product(self, depth):
+        node = self.parse_unary(depth)
+        while self.peek() in (('op', '*'), ('op', '/')):
+            op = self.tokens[self.pos][1]
+            self.pos += 1
+            node = (op, node, self.parse_unary(depth))
+        return node
+
+    def parse_unary(self, depth):
+        if depth > MAX_NESTING_DEPTH:
+            raise self.error()
+        kind, value = self.peek()
+        if (kind, value) in (('op', '+'), ('op', '-')):
+            self.pos += 1
+            node = self.parse_unary(depth + 1)
+            return ('neg', node) if value == '-' else node
+        elif (kind, value) == ('op', '('):
+            self.pos += 1
+            node = self.parse_sum(depth + 1)
+            if self.peek() != ('op', ')'):
+                raise self.error()
+            self.pos += 1
+            return node
+        elif kind == 'num':
+            self.pos += 1
+            return ('num', value)
+        else:
+            raise self.error()
+
+
+def parse_time_expr(expression):
+    """Parses an expression like `45.5 + 1:20 + 30 / 2` into an AST (see `_Parser`)."""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression is too long ({len(expression)} > {MAX_EXPRESSION_LENGTH} chars)")
+    return _Parser(expression).parse()
+
+
+def _compile_node(node) -> typing.Callable[[], float]:
+    if node[0] == 'num':
+        value = node[1]
+        return lambda: value
+    elif node[0] == 'neg':
+        operand = _compile_node(node[1])
+        return lambda: -operand()
+    else:
+        func = BINARY_OPS[node[0]]
+        left, right = _compile_node(node[1]), _compile_node(node[2])
+        return lambda: func(left(), right())
+
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_time_expr(expression) -> typing.Callable[[], float]:
+    """Parses an expression and turns it into a function that evaluates it. Results are cached, so
+    repeating an expression (or retrying the same one) skips the parsing."""
+    return _compile_node(parse_time_expr(expression))
+
+
+def eval_time_expr(expression):
+    """Takes an expression like `45.5 + 1:20 + 30 / 2` and returns its value in minutes (e.g. 140.5).
+    Raises a ValueError if the expression isn't valid."""
+    try:
+        return float(compile_time_expr(expression)())
+    except ZeroDivisionError:
+        raise ValueError(f"Division by zero: {expression}")
+
@@ -1,14 +1,20 @@
-import json
 import traceback
 import typing
-import time
+import math
 import re
+import weakref
+import collections
+
+import profiling  # (before Kivy, so it can take its command line flags out of sys.argv first)
+from profiling import profiled
 
 from kivy.app import App
 from kivy.lang import Builder
 
 from kivy.uix.textinput import TextInput
 from kivy.uix.popup import Popup
+from kivy.uix.label import Label
+from kivy.uix.scrollview import ScrollView
 from kivy.uix.widget import Widget
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.floatlayout import FloatLayout
@@ -19,12 +25,22 @@ from kivy.properties import ColorProperty
 from kivy.clock import Clock
 from kivy.config import Config
 from kivy.core.window import Window
-from kivy.core.text import LabelBase
+from kivy.core.text import LabelBase, Label as CoreLabel
+from kivy.graphics import Color, InstructionGroup, Line, Mesh, Rectangle
+from kivy.metrics import sp
 from kivy.resources import resource_add_path
 
 import os
 import sys
 
+from engine import RowData, TimerEngine, format_time_ms, get_time_ms
+from history import IntervalStore, history_path
+from timeexpr import eval_time_expr
+from persistence import AutosaveWriter, Journal, back_up_unreadable_autosave, get_default_autosave_filepath, \
+    load_state, next_journal_generation, write_snapshot
+from reports import ReportIndex, format_summary
+from importer import Importer
+
 os.environ["SDL_MOUSE_FOCUS_CLICKTHROUGH"] = '1'
 
 # pyinstaller stuff
@@ -33,16 +49,13 @@ if hasattr(sys, '_MEIPASS'):
 
 DO_AUTOSAVES = True
 AUTOSAVE_INTERVAL_SECS = 5 * 60
+AUTOSAVE_ON_CLOSE_TIMEOUT_SECS = 3  # how long closing the window may wait for the final save
 
-AUTO_SAVE_DIR = None
-if DO_AUTOSAVES:
-    try:
-        import appdirs
-        AUTO_SAVE_DIR = os.path.join(appdirs.user_data_dir("TimeIt", "Ghast"), "autosaves")
-    except ImportError:
-        DO_AUTOSAVES = False
-        print("ERROR: appdirs isn't installed, disabling autosaves")
-        traceback.print_exc()
+TICK_SLACK_MS = 20  # wake up a little after the running timer's second ticks over, never before it
+
+if DO_AUTOSAVES and get_default_autosave_filepath(and_create=False) is None:
+    DO_AUTOSAVES = False
+    print("ERROR: appdirs isn't installed, disabling autosaves")
 
 
 Config.set('input', 'mouse', 'mouse,multitouch_on_demand')  # red dots begone
@@ -81,6 +94,15 @@ PAUSED_TEXT = "Paused"
 RESUME_TEXT = "Resume"
 
 ADD_ACTIVITY_TEXT = "Add Activity"
+REPORT_TEXT = "Report"
+REPORT_TITLE_TEXT = "Time Spent"
+IMPORT_TITLE_TEXT = "Importing {0}"
+IMPORT_PROGRESS_TEXT = "Reading... {0}%"
+IMPORT_MERGING_TEXT = "Merging history..."
+IMPORT_DONE_TEXT = "Imported {0} rows into {1} activities\n({2} rows skipped, {3} of overlapping time trimmed)"
+IMPORT_FAILED_TEXT = "Import failed, see the log for details"
+CLOSE_TEXT = "Close"
+NUM_DEFAULT_ROWS = 5
 NEW_ACTIVITY_TEXT = "Activity {0}"
 
 EDIT_ACTIVITY_TEXT = "Edit {0}"
@@ -94,10 +116,15 @@ ZERO_TIME = "0:00:00"
 FG_COLOR = tuple(x/255. for x in (128, 222, 234))
 FG_COLOR_DIM = tuple(x * 0.333 for x in FG_COLOR)
 
-def set_fg_color(rgb):
+def set_fg_color(rgb, dim_rgb=None):
     global FG_COLOR, FG_COLOR_DIM
     FG_COLOR = rgb
-    FG_COLOR_DIM = tuple(x * 0.333 for x in FG_COLOR)
+    FG_COLOR_DIM = dim_rgb if dim_rgb is not None else tuple(x * 0.333 for x in FG_COLOR)
+
+
+def quantize_color(rgb):
+    """Rounds a color to 8 bits per channel, i.e. the smallest change that's actually visible."""
+    return tuple(round(x * 255) / 255. for x in rgb)
 
 
 SECONDARY_COLOR = tuple(x/255. for x in (240, 240, 240))
@@ -113,33 +140,19 @@ CANCEL_COLOR = (1, 0, 0)
 RAINBOW_HUE_OFFSET = 0  # color at 12am
 
 RAINBOW_PERIOD_HOURS = 12  # 12 hour cycle
+RAINBOW_STEPS = 2048  # hues in the precomputed table, fine enough that neighbours mostly differ by 1/255
 
 TITLE_FONT_SIZE = 64
 REGULAR_FONT_SIZE = 20
 SPACING = 4  # sp
 ROW_HEIGHT = int(2 * REGULAR_FONT_SIZE)
+VIRTUAL_ROW_OVERSCAN = 2  # rows kept bound above & below the visible part of the list
+ROW_VIEW_POOL_SIZE = 32  # unbound row views kept for reuse (or a screenful, if that's more), oldest dropped first
 
 global_popup_var = []
 last_mouse_pos = (0, 0)
 
 
-def safe_eval_time_string(expression):
-    """Takes an expression like `45.5 + 1:20 + 30 / 2` and returns its value (e.g. 140.5)."""
-
-    def decolonize(match_obj):
-        if match_obj.group(1) is not None:
-            split = match_obj.group(1).split(":")
-            hours = int(split[0]) if split[0] else 0
-            return str(hours * 60 + int(split[1]))
-
-    no_colons = re.sub(r"(\d*:\d+)", decolonize, expression)
-
-    if re.match(r"[\d.+\-*/\w()]*", no_colons):
-        return float(eval(no_colons))
-    else:
-        raise ValueError(f"Illegal expression: {expression}")
-
-
 Builder.load_string(f"""
 <Label>:
     font_name: '{REGULAR_FONT}'
@@ -147,18 +160,6 @@ Builder.load_string(f"""
     
 <LineBorderWidget>:
     background_color: {BG_COLOR}
-
-    canvas.after:
-        Color:
-            rgba: self.line_color
-        Line:
-            width: 1
-            close: False
-            points: self.pos[0],                    self.pos[1] + 1, \
-                    self.pos[0] + self.size[0] - 1, self.pos[1] + 1, \
-                    self.pos[0] + self.size[0] - 1, self.pos[1] + self.size[1] - 1, \
-                    self.pos[0],                    self.pos[1] + self.size[1] - 1, \
-                    self.pos[0],                    self.pos[1]
     
 <MyTextInput>:
     padding_y: [self.height / 2.0 - (self.line_height / 2.0) * len(self._lines), 0]
@@ -177,18 +178,6 @@ Builder.load_string(f"""
         Rectangle:
             pos: self.pos[0] + 1, self.pos[1] + 1
             size: self.size[0] - 2, self.size[1] - 2
-    canvas.after:
-        Color:
-            rgba: self.line_color
-        Line:
-            width: 1
-            close: True
-            cap: 'square'
-            joint: 'miter'
-            points: self.pos[0] + 1,                self.pos[1] + 1, \
-                    self.pos[0] + self.size[0] - 1, self.pos[1] + 1, \
-                    self.pos[0] + self.size[0] - 1, self.pos[1] + self.size[1] - 1, \
-                    self.pos[0] + 1,                self.pos[1] + self.size[1] - 1
                     
 <Boxes>:
     id: _parent
@@ -196,6 +185,7 @@ Builder.load_string(f"""
     boxes: _boxes 
     title_img: _title_img
     pause_btn: _pause_btn
+    report_btn: _report_btn
     add_btn: _add_btn
     
     BoxLayout:
@@ -216,9 +206,8 @@ Builder.load_string(f"""
             scroll_type: ['bars']
             bar_width: 4
         
-            BoxLayout: 
+            FloatLayout:
                 id: _boxes
-                orientation: 'vertical'
             
         BoxLayout:
             orientation: 'horizontal'
@@ -245,6 +234,16 @@ Builder.load_string(f"""
             #     font_size: '{REGULAR_FONT_SIZE}sp'
             #     size_hint: (None, 1)
             #     width: '{ROW_HEIGHT * 4 + SPACING * 2}sp'
+            MyButton:
+                id: _report_btn
+                text: '{REPORT_TEXT}'
+                on_press: _parent.create_report_popup()
+                font_size: '{REGULAR_FONT_SIZE}sp'
+                size_hint: (None, 1)
+                width: '{ROW_HEIGHT * 3}sp'
+            Widget:
+                size_hint: (None, 1)
+                width: '{SPACING}sp'
             MyButton:
                 id: _add_btn
                 text: '{ADD_ACTIVITY_TEXT}'
@@ -255,50 +254,78 @@ Builder.load_string(f"""
 """)
 
 
-class RowData:
+class RowView:
+    """The widgets that display a single row. Only rows that are scrolled into view have one, and
+    views get recycled between rows as the list scrolls (see `Boxes._refresh_visible_rows`)."""
 
     def __init__(self, row_widget, timer_btn, textbox, edit_btn, remove_btn):
+        self.row_id = -1
         self.row_widget = row_widget
         self.timer_btn = timer_btn
         self.textbox = textbox
         self.edit_btn = edit_btn
         self.remove_btn = remove_btn
-        self.elapsed_time = 0
+        self.hint_order_idx = -1  # the position that the text field's hint is numbered for
+        edit_btn.row_view = self  # (so a hovered edit button can be traced back to its row)
 
-    def add_time_ms(self, millis):
-        self.set_time_ms(self.elapsed_time + millis)
+    def update_colors(self):
+        for widget in self.row_widget.children:
+            if isinstance(widget, ColorUpdatable):
+                widget.update_colors()
 
-    def set_time_ms(self, millis):
-        self.elapsed_time = max(0, millis)
-        self.update_timer_btn_label()
-        self.update_colors()
+    def use_border_batch(self, batch):
+        for widget in self.row_widget.children:
+            if isinstance(widget, BorderedWidget):
+                widget.use_border_batch(batch)
 
-    def get_time_ms(self):
-        return self.elapsed_time
+    def use_own_borders(self):
+        for widget in self.row_widget.children:
+            if isinstance(widget, BorderedWidget):
+                widget.use_own_border()
 
-    def get_time_str(self):
-        secs = self.elapsed_time // 1000
-        mins = secs // 60
-        hours = mins // 60
-        return f"{hours}:{str(mins % 60).zfill(2)}:{str(secs % 60).zfill(2)}"
+    def hide_borders(self):
+        for widget in self.row_widget.children:
+            if isinstance(widget, BorderedWidget):
+                widget.hide_border()
 
-    def update_timer_btn_label(self):
-        self.timer_btn.text = self.get_time_str()
 
-    def update_colors(self):
-        for widget in self.row_widget.children:
-            if isinstance(widget, ColorUpdatable):
-                widget.update_colors()
+class ColorEngine:
+    """Tracks which widgets use the rainbow foreground color, and recolors only those when it visibly changes."""
 
-    def to_json(self):
-        return {
-            'elapsed_time': self.elapsed_time,
-            'text': self.textbox.text
-        }
+    def __init__(self):
+        self.fg_dependents = weakref.WeakSet()
+        self.dirty = weakref.WeakSet()
+        self.next_change_ms = -1  # when the rainbow color next changes
+
+    def update_for_time(self, t_ms=None):
+        """Moves the foreground color along the rainbow. Returns False (and does nothing) if it hasn't
+        visibly changed, which is all it has to check until `next_change_ms`."""
+        if t_ms is None:
+            t_ms = get_time_ms()
+        if t_ms < self.next_change_ms:
+            return False
+        fg, dim, self.next_change_ms = get_rainbow_table().lookup(t_ms)
+        if fg is FG_COLOR:
+            return False
+        set_fg_color(fg, dim)
+        self.dirty.update(self.fg_dependents)
+        return True
+
+    def track(self, widget, *colors):
+        if any(c is FG_COLOR or c is FG_COLOR_DIM for c in colors):
+            self.fg_dependents.add(widget)
+        else:
+            self.fg_dependents.discard(widget)
+
+    def flush(self):
+        to_update = list(self.dirty)
+        self.dirty.clear()
+        for widget in to_update:
+            widget.update_colors()
+
+
+color_engine = ColorEngine()
 
-    def from_json(self, blob):
-        self.elapsed_time = int(blob['elapsed_time'])
-        self.textbox.text = str(blob['text'])
 
 class ColorUpdatable:
 
@@ -315,31 +342,113 @@ class ColorUpdatable:
         pass
 
 
-class HoverBehavior(Widget):
+class HoverDispatcher:
+    """Routes mouse moves to HoverBehaviors through one `Window.mouse_pos` binding and a grid of their rects."""
 
-    def __init__(self, *args, in_popup=False, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.in_popup = in_popup
-        self.hovering = False
+    CELL_SIZE = 64  # px
+
+    def __init__(self):
+        self.widgets = {}  # HoverBehavior -> None, in registration order
+        self.grid = {}
+        self.grid_dirty = True
+        self.hovered = None
         Window.bind(mouse_pos=self._handle_mouse_move)
 
+    def register(self, widget):
+        if widget not in self.widgets:
+            self.widgets[widget] = None
+            widget.bind(pos=self.invalidate, size=self.invalidate)
+            self.invalidate()
+
+    def unregister(self, widget):
+        if widget in self.widgets:
+            del self.widgets[widget]
+            widget.unbind(pos=self.invalidate, size=self.invalidate)
+            self.invalidate()
+            if widget is self.hovered:
+                self.hovered = None
+                widget.hovering = False
+                widget.on_leave(last_mouse_pos)
+
+    def register_tree(self, root):
+        for widget in root.walk(restrict=True):
+            if isinstance(widget, HoverBehavior):
+                self.register(widget)
+
+    def unregister_tree(self, root):
+        for widget in root.walk(restrict=True):
+            if isinstance(widget, HoverBehavior):
+                self.unregister(widget)
+
+    def get_listener_count(self):
+        """The number of live hover listeners (for diagnosing leaks)."""
+        return len(self.widgets)
+
+    def invalidate(self, *_):
+        self.grid_dirty = True
+
+    def _rebuild_grid(self):
+        self.grid = {}
+        cell = self.CELL_SIZE
+        for widget in self.widgets:
+            if widget.get_root_window() is None:
+                continue
+            x0, y0 = widget.to_window(*widget.pos)
+            x1, y1 = x0 + widget.width, y0 + widget.height
+            rect = (x0, y0, x1, y1)
+            for cx in range(int(x0 // cell), int(x1 // cell) + 1):
+                for cy in range(int(y0 // cell), int(y1 // cell) + 1):
+                    self.grid.setdefault((cx, cy), []).append((widget, rect))
+        self.grid_dirty = False
+
+    def widget_at(self, pos):
+        if self.grid_dirty:
+            self._rebuild_grid()
+
+        popup_active = len(global_popup_var) > 0
+        x, y = pos
+        res = None
+        for widget, (x0, y0, x1, y1) in self.grid.get((int(x // self.CELL_SIZE), int(y // self.CELL_SIZE)), ()):
+            if x0 <= x <= x1 and y0 <= y <= y1 and not (widget.in_popup ^ popup_active):
+                res = widget  # later registrations (e.g. popups) are drawn on top
+        return res
+
+    @profiled()
     def _handle_mouse_move(self, window, pos):
         global last_mouse_pos
         last_mouse_pos = pos
+        self.dispatch_hover(pos)
 
-        in_widget = False
-        if self.get_root_window() is None:
-            in_widget = False
-        elif self.collide_point(*self.to_widget(*pos)):
-            in_widget = True
+    def dispatch_hover(self, pos):
+        target = self.widget_at(pos)
+        if target is not self.hovered:
+            prev = self.hovered
+            self.hovered = target
+            if prev is not None:
+                prev.hovering = False
+                prev.on_leave(pos)
+            if target is not None:
+                target.hovering = True
+                target.on_enter(pos)
 
-        popup_active = len(global_popup_var) > 0
-        if self.in_popup ^ popup_active:
-            in_widget = False
 
-        if in_widget != self.hovering:
-            self.hovering = in_widget
-            self.on_enter(pos) if self.hovering else self.on_leave(pos)
+hover_dispatcher = HoverDispatcher()
+
+
+class HoverBehavior(Widget):
+
+    def __init__(self, *args, in_popup=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_popup = in_popup
+        self.hovering = False
+        hover_dispatcher.register(self)
+        self.bind(parent=self._on_parent_changed)
+
+    def _on_parent_changed(self, _, parent):
+        if parent is None:
+            hover_dispatcher.unregister(self)
+        else:
+            hover_dispatcher.register(self)
 
     def on_enter(self, pos):
         pass
@@ -348,14 +457,168 @@ class HoverBehavior(Widget):
         pass
 
 
-class LineBorderWidget(Widget, ColorUpdatable):
+class BorderedWidget:
+    """A widget with a 1px border in its `line_color`. It draws the border itself, unless it's been
+    handed to a `BorderBatch` (which draws the borders of lots of widgets at once)."""
+
+    border_inset = (0, 1, 1, 1)  # left, bottom, right, top
+
+    def init_border(self):
+        self.border_batch: typing.Optional[BorderBatch] = None
+        self._own_border = None
+        self.use_own_border()
+
+    def get_border_rect(self):
+        left, bottom, right, top = self.border_inset
+        return self.x + left, self.y + bottom, self.right - right, self.top - top
+
+    def use_own_border(self):
+        self._leave_border_batch()
+        if self._own_border is None:
+            self._own_border = (Color(*self.line_color), Line(width=1, close=True))
+            for instruction in self._own_border:
+                self.canvas.after.add(instruction)
+            for name in ('pos', 'size', 'line_color'):
+                self.fbind(name, self._update_own_border)
+            self._update_own_border()
+
+    def use_border_batch(self, batch):
+        self._remove_own_border()
+        if batch is not self.border_batch:
+            self._leave_border_batch()
+            self.border_batch = batch
+            batch.add(self)
+
+    def hide_border(self):
+        self._remove_own_border()
+        self._leave_border_batch()
+
+    def _update_own_border(self, *_):
+        color, line = self._own_border
+        x0, y0, x1, y1 = self.get_border_rect()
+        color.rgba = self.line_color
+        line.points = [x0, y0, x1, y0, x1, y1, x0, y1]
+
+    def _remove_own_border(self):
+        if self._own_border is not None:
+            for name in ('pos', 'size', 'line_color'):
+                self.funbind(name, self._update_own_border)
+            for instruction in self._own_border:
+                self.canvas.after.remove(instruction)
+            self._own_border = None
+
+    def _leave_border_batch(self):
+        if self.border_batch is not None:
+            self.border_batch.remove(self)
+            self.border_batch = None
+
+
+class _BorderMesh:
+    """The borders of every widget in a `BorderBatch` that currently has a particular color."""
+
+    def __init__(self, color):
+        self.key = color
+        self.color = Color(*color)
+        self.mesh = Mesh(mode='lines')
+        self.widgets: typing.List[BorderedWidget] = []
+        self.vertices: typing.List[float] = []  # 4 corners * (x, y, u, v) per widget
+        self.num_indexed = 0  # how many widgets `mesh.indices` covers
+
+
+class BorderBatch:
+    """Draws many `BorderedWidget`s' borders as one lines `Mesh` per border color, rather than a `Line` each."""
+
+    def __init__(self, canvas):
+        self.group = InstructionGroup()
+        canvas.add(self.group)
+        self.meshes: typing.Dict[tuple, _BorderMesh] = {}
+        self.slots: typing.Dict[BorderedWidget, typing.Tuple[_BorderMesh, int]] = {}
+        self._dirty: typing.Set[_BorderMesh] = set()
+        self._trigger_upload = Clock.create_trigger(self._upload)
+
+    def add(self, widget: BorderedWidget):
+        if widget not in self.slots:
+            self._place(widget, tuple(widget.line_color))
+            widget.fbind('pos', self._on_geometry_changed, widget)
+            widget.fbind('size', self._on_geometry_changed, widget)
+            widget.fbind('line_color', self._on_color_changed, widget)
+
+    def remove(self, widget: BorderedWidget):
+        if widget in self.slots:
+            widget.funbind('pos', self._on_geometry_changed, widget)
+            widget.funbind('size', self._on_geometry_changed, widget)
+            widget.funbind('line_color', self._on_color_changed, widget)
+            self._unplace(widget)
+
+    def _place(self, widget, color):
+        mesh = self.meshes.get(color)
+        if mesh is None:
+            mesh = self.meshes[color] = _BorderMesh(color)
+            self.group.add(mesh.color)
+            self.group.add(mesh.mesh)
+        self.slots[widget] = (mesh, len(mesh.widgets))
+        mesh.widgets.append(widget)
+        mesh.vertices.extend((0.,) * 16)
+        self._write_corners(widget)
+
+    def _unplace(self, widget):
+        mesh, slot = self.slots.pop(widget)
+        last = len(mesh.widgets) - 1
+        if slot != last:
+            # the last widget takes over the freed slot, so the vertices stay packed
+            moved = mesh.widgets[slot] = mesh.widgets[last]
+            mesh.vertices[slot * 16:(slot + 1) * 16] = mesh.vertices[last * 16:]
+            self.slots[moved] = (mesh, slot)
+        del mesh.widgets[last]
+        del mesh.vertices[last * 16:]
+        self._mark_dirty(mesh)
+
+    def _write_corners(self, widget):
+        mesh, slot = self.slots[widget]
+        x0, y0, x1, y1 = widget.get_border_rect()
+        mesh.vertices[slot * 16:(slot + 1) * 16] = (x0, y0, 0., 0., x1, y0, 0., 0., x1, y1, 0., 0., x0, y1, 0., 0.)
+        self._mark_dirty(mesh)
+
+    def _mark_dirty(self, mesh):
+        self._dirty.add(mesh)
+        self._trigger_upload()
+
+    def _on_geometry_changed(self, widget, *_):
+        self._write_corners(widget)
+
+    def _on_color_changed(self, widget, _, color):
+        color = tuple(color)
+        if self.slots[widget][0] is not self.meshes.get(color):
+            self._unplace(widget)
+            self._place(widget, color)
+
+    def _upload(self, *_):
+        for mesh in self._dirty:
+            if len(mesh.widgets) == 0:
+                # (the rainbow goes through a lot of colors, so don't keep the empty ones around)
+                self.group.remove(mesh.color)
+                self.group.remove(mesh.mesh)
+                if self.meshes.get(mesh.key) is mesh:
+                    del self.meshes[mesh.key]
+                continue
+            mesh.mesh.vertices = mesh.vertices
+            if mesh.num_indexed != len(mesh.widgets):
+                mesh.num_indexed = len(mesh.widgets)
+                mesh.mesh.indices = [4 * slot + corner for slot in range(mesh.num_indexed)
+                                     for corner in (0, 1, 1, 2, 2, 3, 3, 0)]
+        self._dirty.clear()
+
+
+class LineBorderWidget(Widget, BorderedWidget, ColorUpdatable):
     line_color = ColorProperty(DISABLED_FG_COLOR)
 
     def calc_line_color(self):
         return DISABLED_FG_COLOR
 
     def update_colors(self):
-        self.line_color = self.calc_line_color()
+        line_color = self.calc_line_color()
+        self.line_color = line_color
+        color_engine.track(self, line_color)
 
 
 class MyButton(Button, HoverBehavior, LineBorderWidget):
@@ -363,6 +626,7 @@ class MyButton(Button, HoverBehavior, LineBorderWidget):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.hover_cursor = None
+        self.init_border()
 
     def on_enter(self, *args):
         if self.hover_cursor is not None:
@@ -381,15 +645,20 @@ class MyButton(Button, HoverBehavior, LineBorderWidget):
             return FG_COLOR
 
     def update_colors(self):
-        super().update_colors()
-        self.color = self.calc_text_color()
-        self.background_color = self.calc_fill_color()
+        line_color = self.calc_line_color()
+        text_color = self.calc_text_color()
+        fill_color = self.calc_fill_color()
+        self.line_color = line_color
+        self.color = text_color
+        self.background_color = fill_color
+        color_engine.track(self, line_color, text_color, fill_color)
 
 
 class MyTextInput(TextInput, HoverBehavior, LineBorderWidget):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.init_border()
 
     def on_enter(self, *args):
         Window.set_system_cursor('ibeam')
@@ -406,9 +675,10 @@ class MyTextInput(TextInput, HoverBehavior, LineBorderWidget):
             return DISABLED_FG_COLOR
 
 
-class MyToggleButton(ToggleButton, HoverBehavior, ColorUpdatable):
+class MyToggleButton(ToggleButton, HoverBehavior, BorderedWidget, ColorUpdatable):
 
     line_color = ColorProperty(DISABLED_FG_COLOR)
+    border_inset = (1, 1, 1, 1)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -418,7 +688,11 @@ class MyToggleButton(ToggleButton, HoverBehavior, ColorUpdatable):
         self.background_disabled_normal = TRANSPARENT_PNG
         self.background_disabled_down = TRANSPARENT_PNG
 
+        # toggling another button in the group changes this one's state too
+        self.bind(state=lambda *_: self.update_colors(),
+                  disabled=lambda *_: self.update_colors())
         self.update_colors()
+        self.init_border()
 
     def on_enter(self, *args):
         self.update_colors()
@@ -447,59 +721,208 @@ class MyToggleButton(ToggleButton, HoverBehavior, ColorUpdatable):
             return FG_COLOR if self.state == 'down' else DISABLED_FG_COLOR
 
     def update_colors(self):
-        self.line_color = self.calc_line_color()
-        self.color = self.calc_text_color()
-        self.background_color = self.calc_fill_color()
+        line_color = self.calc_line_color()
+        text_color = self.calc_text_color()
+        fill_color = self.calc_fill_color()
+        self.line_color = line_color
+        self.color = text_color
+        self.background_color = fill_color
+        color_engine.track(self, line_color, text_color, fill_color)
+
+
+class GlyphAtlas:
+    """Every character a timer can show, rendered once into a single texture. They're rendered in
+    white, so the same atlas can be tinted whatever color the timer needs to be."""
+
+    GLYPHS = "0123456789:"
+
+    def __init__(self, font_name, font_size):
+        label = CoreLabel(text=self.GLYPHS, font_name=font_name, font_size=font_size, color=(1, 1, 1, 1))
+        label.refresh()
+        self.texture = label.texture
+        self.glyph_width = int(round(self.texture.width / len(self.GLYPHS)))  # (it's a monospace font)
+        self.glyph_height = self.texture.height
+        self.regions = {ch: self.texture.get_region(i * self.glyph_width, 0, self.glyph_width, self.glyph_height)
+                        for i, ch in enumerate(self.GLYPHS)}
+
+
+_glyph_atlases: typing.Dict[typing.Tuple[str, float], GlyphAtlas] = {}
+
+
+def get_glyph_atlas(font_name, font_size) -> GlyphAtlas:
+    key = (font_name, font_size)
+    if key not in _glyph_atlases:
+        _glyph_atlases[key] = GlyphAtlas(font_name, font_size)
+    return _glyph_atlases[key]
+
+
+class TimerToggleButton(MyToggleButton):
+    """A toggle button showing a time, drawn glyph by glyph out of a `GlyphAtlas` rather than rendering
+    a new texture each time the text changes. A tick only swaps the textures of the digits that changed.
+    Text that isn't all digits & colons gets rendered the usual way."""
+
+    def __init__(self, **kwargs):
+        self._atlas: typing.Optional[GlyphAtlas] = None
+        self._glyph_rects: typing.List[Rectangle] = []
+        self._glyph_chars: typing.List[typing.Optional[str]] = []
+        self._glyph_color = Color(1, 1, 1, 1)
+        self._glyph_group = InstructionGroup()
+        super().__init__(**kwargs)
+        self.canvas.add(self._glyph_color)
+        self.canvas.add(self._glyph_group)
+        self.fbind('color', self._update_glyph_color)
+        self.fbind('pos', self._layout_glyphs)
+        self.fbind('size', self._layout_glyphs)
+        self._update_glyph_color()
+
+    def _can_use_atlas(self):
+        return len(self.text) > 0 and all(ch in GlyphAtlas.GLYPHS for ch in self.text)
+
+    def texture_update(self, *largs):
+        if self._can_use_atlas():
+            self.texture = None
+            self.texture_size = [0, 0]
+            self._update_glyphs()
+        else:
+            self._clear_glyphs()
+            super().texture_update(*largs)
+
+    def _clear_glyphs(self):
+        self._glyph_group.clear()
+        self._glyph_rects = []
+        self._glyph_chars = []
+
+    def _update_glyphs(self):
+        atlas = get_glyph_atlas(self.font_name, self.font_size)
+        text = self.text
+        if atlas is not self._atlas or len(text) != len(self._glyph_rects):
+            self._atlas = atlas
+            self._clear_glyphs()
+            for _ in text:
+                rect = Rectangle(size=(atlas.glyph_width, atlas.glyph_height))
+                self._glyph_group.add(rect)
+                self._glyph_rects.append(rect)
+                self._glyph_chars.append(None)
+            self._layout_glyphs()
+
+        for i, ch in enumerate(text):
+            if ch != self._glyph_chars[i]:
+                self._glyph_rects[i].texture = atlas.regions[ch]
+                self._glyph_chars[i] = ch
+
+    def _layout_glyphs(self, *_):
+        if self._atlas is not None:
+            x = round(self.center_x - len(self._glyph_rects) * self._atlas.glyph_width / 2)
+            y = round(self.center_y - self._atlas.glyph_height / 2)
+            for i, rect in enumerate(self._glyph_rects):
+                rect.pos = (x + i * self._atlas.glyph_width, y)
+
+    def _update_glyph_color(self, *_):
+        self._glyph_color.rgba = self.color
 
 
 class Boxes(FloatLayout):
 
-    def __init__(self, parent, **kwargs):
+    def __init__(self, parent, num_default_rows=NUM_DEFAULT_ROWS, **kwargs):
         super(Boxes, self).__init__(**kwargs)
         self._parent = parent
         self._btn_group = 'group0'
         self.boxes.size_hint = (1, None)
-        self.boxes.spacing = f'{SPACING}sp'
 
-        self.activity_id_counter = 0
-        self.active_row_id_before_pause = [-1]
+        self.engine = TimerEngine()
+        self.report_index: typing.Optional[ReportIndex] = None
 
         self.floating_row = -1
         self.floating_row_widget = None
+        self.drag_placeholder_idx = -1
         self.dragging_edit_btn_row = -1
+        self.drag_ordering: typing.Optional[typing.List[int]] = None
         self.dragging_edit_mode = None
+        self._edit_drag_target_row = -1  # the row whose edit button is highlighted as the drop target
+        self._edit_drag_shown_mode = None
+        self._mouse_motion_spos = None
+        self._trigger_mouse_motion = Clock.create_trigger(self._process_mouse_motion)
 
         self._cached_cursor_col = -1
+        self._window_caption = None
 
-        self.active_row_id = -1
-        self.row_lookup: typing.Dict[int, RowData] = {}
-        self.row_ordering = []
-        for _ in range(5):
-            self.add_row()
+        # only the rows that are (nearly) on screen have widgets
+        self.row_views: typing.Dict[int, RowView] = {}
+        self.row_view_pool: typing.Deque[RowView] = collections.deque()
+        self.border_batch = BorderBatch(self.boxes.canvas.after)  # draws the borders of every bound row
+        self._trigger_refresh = Clock.create_trigger(self._refresh_visible_rows)
+        self.scroller.bind(scroll_y=self._refresh_visible_rows, height=self._trigger_refresh)
+        self.boxes.bind(pos=self._trigger_refresh, size=self._trigger_refresh)
+
+        self.add_default_rows(num_default_rows)
 
         self._build_pause_btn()
         self._build_add_btn()
 
         Window.bind(on_motion=lambda _, etype, me: self.handle_mouse_motion(etype, me))
+        Window.bind(size=hover_dispatcher.invalidate)
+        self.scroller.bind(scroll_y=hover_dispatcher.invalidate)
         Window.bind(on_touch_up=lambda _, me: self.handle_mouse_release(me))
 
-        self.last_time_seen_ms = int(time.time() * 1000)
-        self.last_autosave_time_ms = self.last_time_seen_ms
-        self.timer = Clock.schedule_interval(self.inc_time, 0.5)
+        self.last_autosave_time_ms = get_time_ms()
+        self.timer = Clock.create_trigger(self.inc_time)
+        self.schedule_next_tick()
 
+        self.autosave_writer = AutosaveWriter() if DO_AUTOSAVES else None
+        # set if the autosave couldn't be read or moved aside, so it doesn't get overwritten
+        self.autosave_blocked = False
         if DO_AUTOSAVES:
             # do an autosave when the window is closed
-            Window.bind(on_request_close=lambda *_: self.save_to_disk())
+            Window.bind(on_request_close=lambda *_: self.save_to_disk(wait_secs=AUTOSAVE_ON_CLOSE_TIMEOUT_SECS))
 
+        # dropping a CSV or JSON Lines file onto the window imports it (one at a time)
+        self.importer: typing.Optional[Importer] = None
+        Window.bind(on_drop_file=lambda _, filepath, *args: self.import_file(
+            filepath.decode('utf-8') if isinstance(filepath, bytes) else filepath))
+
+    @property
+    def row_lookup(self) -> typing.Dict[int, RowData]:
+        return self.engine.row_lookup
+
+    @property
+    def row_ordering(self) -> typing.Sequence[int]:
+        """The order the rows are displayed in. While a row is being dragged, it's left out of this,
+        and an empty slot (-2) marks where it'll be dropped."""
+        return self.drag_ordering if self.drag_ordering is not None else self.engine.row_ordering
+
+    @property
+    def active_row_id(self):
+        return self.engine.active_row_id
+
+    @property
+    def paused_row_id(self):
+        return self.engine.paused_row_id
+
+    @property
+    def journal(self) -> typing.Optional[Journal]:
+        return self.engine.journal
+
+    @profiled()
     def handle_mouse_motion(self, etype, me):
-        if self.floating_row >= 0:
-            Clock.schedule_once(lambda dt: self.update_floating_row(me.spos))
+        if self.dragging_edit_btn_row >= 0 and self.dragging_edit_mode is None and me.button is not None:
+            self.dragging_edit_mode = 'all' if me.button == 'right' else 'normal'
+        if self.floating_row >= 0 or self.dragging_edit_btn_row >= 0:
+            # only the latest position matters, and it's handled at most once per frame
+            self._mouse_motion_spos = me.spos
+            self._trigger_mouse_motion()
+
+    @profiled()
+    def _process_mouse_motion(self, _):
+        if self.floating_row >= 0 and self._mouse_motion_spos is not None:
+            self.update_floating_row(self._mouse_motion_spos)
         if self.dragging_edit_btn_row >= 0:
-            if self.dragging_edit_mode is None and me.button is not None:
-                self.dragging_edit_mode = 'all' if me.button == 'right' else 'normal'
-            self.update_all_edit_buttons()
+            self.update_edit_drag_targets()
 
     def handle_mouse_release(self, me):
+        if self._trigger_mouse_motion.is_triggered:
+            # catch up with wherever the mouse ended up before dropping anything
+            self._trigger_mouse_motion.cancel()
+            self._process_mouse_motion(None)
         if self.floating_row >= 0:
             self.release_floating_row(me)
         if self.dragging_edit_btn_row >= 0:
@@ -507,77 +930,109 @@ class Boxes(FloatLayout):
 
     def start_dragging_row(self, i, me):
         self.floating_row = i
-        Clock.schedule_once(lambda dt: self.update_floating_row(me.spos))
+        self._mouse_motion_spos = me.spos
+        self._trigger_mouse_motion()
 
+    @profiled()
     def update_floating_row(self, mouse_sxy):
         if self.floating_row >= 0:
             hover_order_idx = self.get_row_order_idx_at(mouse_sxy, constrain=True)
 
-            new_ordering = []
-            for row_id in self.row_ordering:
-                if len(new_ordering) == hover_order_idx:
-                    new_ordering.append(-2)
-                if row_id >= 0 and row_id != self.floating_row:
-                    new_ordering.append(row_id)
-            if len(new_ordering) == hover_order_idx:
-                new_ordering.append(-2)
-            self.reorder_rows(new_ordering, update_hints=False)
-
             if self.floating_row_widget is None:
+                view = self.row_views.get(self.floating_row)
+                if view is None:
+                    return
+
+                # pick the row up, leaving an empty slot (-2) in the displayed ordering
+                self.drag_placeholder_idx = self.engine.row_ordering.index(self.floating_row)
+                self.drag_ordering = list(self.engine.row_ordering)
+                self.drag_ordering[self.drag_placeholder_idx] = -2
+                self.boxes.remove_widget(view.row_widget)
+                view.use_own_borders()  # (it's outside the scrolled area now, so the batch can't draw it)
+
                 self.floating_row_widget = BoxLayout(size_hint=(None, None),
                                                      size=(self.size[0] - SPACING * 2, ROW_HEIGHT))
-                self.floating_row_widget.add_widget(self.row_lookup[self.floating_row].row_widget)
+                self.floating_row_widget.add_widget(view.row_widget)
                 self.add_widget(self.floating_row_widget)
 
+            if hover_order_idx != self.drag_placeholder_idx:
+                # only the empty slot moves, so only the rows in between shift (and only visible ones get laid out)
+                self.drag_ordering.pop(self.drag_placeholder_idx)
+                self.drag_ordering.insert(hover_order_idx, -2)
+                self.drag_placeholder_idx = hover_order_idx
+                self._refresh_visible_rows()
+
             self.floating_row_widget.pos = (SPACING, Window.size[1] * mouse_sxy[1] - ROW_HEIGHT / 2)
 
+    @profiled()
     def release_floating_row(self, me):
         if self.floating_row >= 0:
             if self.floating_row_widget is not None:
-                for child in list(self.floating_row_widget.children):
-                    self.floating_row_widget.remove_widget(child)
+                row_widget = self.row_views[self.floating_row].row_widget
+                self.floating_row_widget.remove_widget(row_widget)
                 self.remove_widget(self.floating_row_widget)
                 self.floating_row_widget = None
 
-            new_ordering = [(row_id if row_id >= 0 else self.floating_row) for row_id in self.row_ordering]
-            self.reorder_rows(new_ordering, update_hints=True)
+                self.drag_ordering = None
+                self.boxes.add_widget(row_widget)
+                self.row_views[self.floating_row].use_border_batch(self.border_batch)
+                self.engine.move_row(self.floating_row, self.drag_placeholder_idx)
+                self.drag_placeholder_idx = -1
+
             self.floating_row = -1
+            self._refresh_visible_rows()
 
     def start_dragging_edit_button(self, i):
         self.dragging_edit_btn_row = i
+        self._edit_drag_target_row = -1
+        self._edit_drag_shown_mode = self.dragging_edit_mode
+        self.update_all_edit_buttons()  # every other row becomes a drop target
 
     def update_all_edit_buttons(self):
-        for row_id in self.row_lookup.keys():
-            row = self.row_lookup[row_id]
-            row.edit_btn.update_colors()
-
-            if self.dragging_edit_btn_row < 0:
-                row.edit_btn.text = EDIT_TEXT
-            elif row.edit_btn.hovering:
-                if row_id == self.dragging_edit_btn_row:
-                    row.edit_btn.text = EDIT_TEXT  # No xfer happening
-                else:
-                    row.edit_btn.text = EDIT_DRAG_TO_TEXT if self.dragging_edit_mode != 'all' else EDIT_DRAG_ALL_TEXT
+        for row_id in self.row_views:
+            self._update_edit_button(row_id)
+
+    def update_edit_drag_targets(self):
+        """Updates the edit buttons after the mouse moved mid-drag. Only the one being hovered (and the one
+        that was, and the one being dragged from) can have changed, however many rows there are."""
+        hovered = hover_dispatcher.hovered
+        view = getattr(hovered, 'row_view', None)
+        target_row = view.row_id if view is not None and hovered is view.edit_btn else -1
+        if target_row != self._edit_drag_target_row or self.dragging_edit_mode != self._edit_drag_shown_mode:
+            for row_id in {self._edit_drag_target_row, target_row, self.dragging_edit_btn_row}:
+                if row_id in self.row_views:
+                    self._update_edit_button(row_id)
+            self._edit_drag_target_row = target_row
+            self._edit_drag_shown_mode = self.dragging_edit_mode
+
+    def _update_edit_button(self, row_id):
+        edit_btn = self.row_views[row_id].edit_btn
+        edit_btn.update_colors()
+
+        if self.dragging_edit_btn_row < 0:
+            edit_btn.text = EDIT_TEXT
+        elif edit_btn.hovering:
+            if row_id == self.dragging_edit_btn_row:
+                edit_btn.text = EDIT_TEXT  # No xfer happening
             else:
-                if row_id == self.dragging_edit_btn_row:
-                    row.edit_btn.text = EDIT_DRAG_FROM_TEXT
-                else:
-                    row.edit_btn.text = EDIT_DRAG_TARGET_TEXT  # Drag Target
+                edit_btn.text = EDIT_DRAG_TO_TEXT if self.dragging_edit_mode != 'all' else EDIT_DRAG_ALL_TEXT
+        else:
+            if row_id == self.dragging_edit_btn_row:
+                edit_btn.text = EDIT_DRAG_FROM_TEXT
+            else:
+                edit_btn.text = EDIT_DRAG_TARGET_TEXT  # Drag Target
 
     def release_edit_button(self, me):
         if self.dragging_edit_btn_row >= 0:
             mouse_xy = (int(Window.size[0] * me.spos[0]),
                         int(Window.size[1] * me.spos[1]))
-            for row_id in self.row_lookup.keys():
-                row = self.row_lookup[row_id]
-                if row.edit_btn.collide_point(*row.edit_btn.to_widget(*mouse_xy)):
+            for row_id, view in self.row_views.items():
+                if view.edit_btn.collide_point(*view.edit_btn.to_widget(*mouse_xy)):
                     if row_id != self.dragging_edit_btn_row:
                         if self.dragging_edit_mode == 'all':
-                            dest_row = self.get_row_data(row_id)
                             from_row = self.get_row_data(self.dragging_edit_btn_row)
-                            if dest_row is not None and from_row is not None and from_row != dest_row:
-                                all_ms = from_row.get_time_ms()
-                                self._transfer_time_between_rows(all_ms, dest_row, from_row)
+                            if from_row is not None:
+                                self._transfer_time_between_rows(from_row.get_time_ms(), row_id, from_row.row_id)
                         else:
                             Clock.schedule_once(lambda dt, _dest_id=row_id, _src_id=self.dragging_edit_btn_row:
                                                 self.create_edit_popup(_dest_id, _src_id))
@@ -592,113 +1047,191 @@ class Boxes(FloatLayout):
         box_size = self.boxes.size
         pos_rel_to_box = (scr_xy_px[0] - box_xy[0],
                           box_xy[1] + box_size[1] - scr_xy_px[1])
-        row_order_idx = pos_rel_to_box[1] // (ROW_HEIGHT + SPACING)
+        row_order_idx = int(pos_rel_to_box[1] // sp(ROW_HEIGHT + SPACING))
         if constrain:
             row_order_idx = max(0, min(row_order_idx, len(self.row_ordering) - 1))
 
         return row_order_idx
 
-    def reorder_rows(self, new_ordering, update_hints=True):
-        old_scroll_y = self.scroller.scroll_y
-        old_widgets = list(self.boxes.children)
-        for widget in old_widgets:
-            self.boxes.remove_widget(widget)
-
-        self.row_ordering = new_ordering
-        for i in self.row_ordering:
-            if i in self.row_lookup:
-                self.boxes.add_widget(self.row_lookup[i].row_widget)
-            else:
-                self.boxes.add_widget(Widget(size_hint=(1, None), height=f'{ROW_HEIGHT}sp'))
-
-        if update_hints:
-            self._update_row_hint_texts()
-
-        self._update_boxes_height()
-        self.scroller.scroll_y = old_scroll_y
-
-    def _update_row_hint_texts(self):
-        hint_text_cnt = 1
-        for i in self.row_ordering:
-            if i in self.row_lookup:
-                self.row_lookup[i].textbox.hint_text = NEW_ACTIVITY_TEXT.format(hint_text_cnt)
-            hint_text_cnt += 1
+    def _get_visible_order_range(self):
+        pitch = sp(ROW_HEIGHT + SPACING)
+        view_h = self.scroller.height
+        top_offset = (1 - self.scroller.scroll_y) * max(0, self.boxes.height - view_h)
+        first_idx = max(0, int(top_offset // pitch) - VIRTUAL_ROW_OVERSCAN)
+        last_idx = min(len(self.row_ordering) - 1, int((top_offset + view_h) // pitch) + VIRTUAL_ROW_OVERSCAN)
+        return first_idx, last_idx
+
+    @profiled()
+    def _refresh_visible_rows(self, *_):
+        """Binds views to the rows that are (nearly) on screen, lays them out, and recycles the rest."""
+        first_idx, last_idx = self._get_visible_order_range()
+        visible = {}
+        for order_idx in range(first_idx, last_idx + 1):
+            if self.row_ordering[order_idx] in self.row_lookup:
+                visible[self.row_ordering[order_idx]] = order_idx
+
+        for row_id in list(self.row_views.keys()):
+            # a focused text field (or the row being dragged) keeps its widgets even when offscreen
+            if row_id not in visible and row_id != self.floating_row and not self.row_views[row_id].textbox.focus:
+                self._release_row_view(row_id)
+
+        for row_id in list(self.row_views.keys()):
+            if row_id not in visible and row_id != self.floating_row:
+                visible[row_id] = self.row_ordering.index(row_id)
+
+        for row_id, order_idx in visible.items():
+            view = self.row_views.get(row_id)
+            newly_bound = view is None
+            if newly_bound:
+                view = self._bind_row_view(row_id)
+            view.row_widget.pos = (self.boxes.x,
+                                   self.boxes.top - sp(ROW_HEIGHT) - order_idx * sp(ROW_HEIGHT + SPACING))
+            if (newly_bound or self.floating_row < 0) and view.hint_order_idx != order_idx:
+                # (while dragging, the hints keep their old numbers until the row is dropped)
+                view.hint_order_idx = order_idx
+                view.textbox.hint_text = NEW_ACTIVITY_TEXT.format(order_idx + 1)
+
+    def _bind_row_view(self, row_id) -> RowView:
+        # (the most recently released view is the likeliest to still have its textures around)
+        view = self.row_view_pool.pop() if len(self.row_view_pool) > 0 else self._build_row_view()
+        view.row_id = row_id
+        self.row_views[row_id] = view
+
+        self.boxes.add_widget(view.row_widget)
+        view.use_border_batch(self.border_batch)
+        hover_dispatcher.register_tree(view.row_widget)
+        self._sync_row_view(row_id)
+        return view
+
+    def _release_row_view(self, row_id):
+        view = self.row_views.pop(row_id)
+        view.row_id = -1
+        view.textbox.focus = False
+        view.timer_btn.state = 'normal'
+        hover_dispatcher.unregister_tree(view.row_widget)
+        view.hide_borders()
+        if view.row_widget.parent is not None:
+            view.row_widget.parent.remove_widget(view.row_widget)
+        self.row_view_pool.append(view)
+
+        # a screenful of views has to fit, so that reloading every row doesn't rebuild any of them
+        screenful = int(self.scroller.height // sp(ROW_HEIGHT + SPACING)) + 2 * VIRTUAL_ROW_OVERSCAN + 1
+        while len(self.row_view_pool) > max(ROW_VIEW_POOL_SIZE, screenful):
+            # nothing else holds onto an unbound view's widgets, so dropping it is enough to free them
+            self.row_view_pool.popleft()
+
+    def _sync_row_view(self, row_id):
+        """Copies a row's state onto the widgets that are displaying it."""
+        self.row_views[row_id].textbox.text = self.row_lookup[row_id].text
+        self._update_edit_button(row_id)
+        self._update_row_view(row_id)
+
+    def _update_row_view(self, row_id):
+        """Refreshes a row's timer button & colors (but not its text field, which the user may be typing in)."""
+        view = self.row_views.get(row_id)
+        if view is not None and row_id in self.row_lookup:
+            view.timer_btn.state = 'down' if row_id == self.active_row_id else 'normal'
+            view.timer_btn.text = self.row_lookup[row_id].get_time_str()
+            view.update_colors()
+
+    def _update_row_time(self, row_id):
+        """Refreshes just a row's timer text, and only if the second it shows has changed."""
+        view = self.row_views.get(row_id)
+        if view is not None and row_id in self.row_lookup:
+            time_str = self.row_lookup[row_id].get_time_str()
+            if view.timer_btn.text != time_str:
+                was_zero = view.timer_btn.text in ('', ZERO_TIME)
+                view.timer_btn.text = time_str
+                if was_zero:
+                    view.update_colors()  # rows without any time are drawn dimmer
+
+    def _on_rows_changed(self, *row_ids):
+        """Updates the UI after the engine has changed the given rows (and maybe which one is active)."""
+        for row_id in set(row_ids):
+            self._update_row_view(row_id)
+        self.update_pause_btn()
+        self.update_title_img_color()
+        self._update_window_caption()
+        self.schedule_next_tick()  # the running timer (if any) has a new second boundary
 
+    @profiled()
     def inc_time(self, _):
-        cur_time_ms = int(time.time() * 1000)
-        dt = cur_time_ms - self.last_time_seen_ms
-        self.last_time_seen_ms = cur_time_ms
-
-        if self.active_row_id in self.row_lookup:
-            row_data = self.row_lookup[self.active_row_id]
-            row_data.add_time_ms(dt)
+        cur_time_ms = get_time_ms()
+        row_data = self.engine.tick(cur_time_ms)
+        if row_data is not None:
+            self._update_row_time(row_data.row_id)
 
         if DO_AUTOSAVES and 0 < AUTOSAVE_INTERVAL_SECS < (cur_time_ms - self.last_autosave_time_ms) / 1000:
             self.last_autosave_time_ms = cur_time_ms
-            self.save_to_disk()
+            if self.journal is not None:
+                self.journal.sync()  # it already has every change, just make sure they've hit the disk
+            else:
+                self.save_to_disk()
 
-        self._update_foreground_color()
+        self._update_foreground_color(cur_time_ms)
         self._update_window_caption()
+        self.schedule_next_tick()
+
+    def schedule_next_tick(self):
+        """Sleeps until something visible changes: the running timer's next second, or the rainbow color.
+        While nothing's running, that's only the color (and autosaves)."""
+        cur_time_ms = get_time_ms()
+        deadlines = []
+        ms_until_next_second = self.engine.ms_until_next_second(cur_time_ms)
+        if ms_until_next_second is not None:
+            deadlines.append(cur_time_ms + ms_until_next_second + TICK_SLACK_MS)
+        if color_engine.next_change_ms < float('inf'):
+            deadlines.append(color_engine.next_change_ms)
+        if DO_AUTOSAVES and AUTOSAVE_INTERVAL_SECS > 0:
+            deadlines.append(self.last_autosave_time_ms + AUTOSAVE_INTERVAL_SECS * 1000)
+
+        self.timer.cancel()
+        if len(deadlines) > 0:
+            self.timer.timeout = max(0, min(deadlines) - cur_time_ms) / 1000
+            self.timer()
 
     def _update_window_caption(self):
         if self.active_row_id in self.row_lookup:
             row_data = self.row_lookup[self.active_row_id]
-            caption_msg = f"{row_data.textbox.text or UNTITLED_ACTIVITY_TEXT} ~ {row_data.get_time_str()}"
+            caption_msg = f"{row_data.text or UNTITLED_ACTIVITY_TEXT} ~ {row_data.get_time_str()}"
         else:
             caption_msg = PAUSED_TEXT
-        self._parent.title = f"{WINDOW_TITLE} [{caption_msg}]"
+        if caption_msg != self._window_caption:
+            self._window_caption = caption_msg
+            self._parent.title = f"{WINDOW_TITLE} [{caption_msg}]"
 
-    def _update_foreground_color(self):
-        set_fg_color(get_color_for_time())
-        self.update_all_colors()
+    def _update_foreground_color(self, cur_time_ms=None):
+        if color_engine.update_for_time(cur_time_ms):
+            self.update_title_img_color()
+            color_engine.flush()
 
     def get_row_data(self, row_i=None) -> typing.Optional[RowData]:
-        if row_i is None:
-            row_i = self.active_row_id
-        if row_i in self.row_lookup:
-            return self.row_lookup[row_i]
-        else:
-            return None
+        return self.engine.get_row_data(row_i)
 
     def _update_boxes_height(self):
-        n = len(self.boxes.children)
-        self.boxes.height = f"{ROW_HEIGHT * n + int(str(self.boxes.spacing)[:-2]) * (n - 1)}sp"
+        n = len(self.row_ordering)
+        self.boxes.height = f"{ROW_HEIGHT * n + SPACING * (n - 1)}sp"
 
         # XXX otherwise the rows will float in the middle of the scrollpane until you jibble them
         if self.scroller.height > self.boxes.height:
             self.scroller.scroll_y = 1
 
-    def simulate_mouse_hover_after_layout_change(self, widgets):
+    def simulate_mouse_hover_after_layout_change(self):
         if last_mouse_pos is not None:
-            for widget in widgets:
-                if isinstance(widget, HoverBehavior):
-                    if widget.collide_point(*widget.to_widget(*last_mouse_pos)):
-                        widget.hovering = True
-                        widget.on_enter(last_mouse_pos)
-                        if isinstance(widget, ColorUpdatable):
-                            widget.update_colors()
-                        break
+            hover_dispatcher.invalidate()
+            hover_dispatcher.dispatch_hover(last_mouse_pos)
 
     def remove_row(self, i, simulate_hover_evt=False):
         if i in self.row_lookup:
             old_boxes_height = self.boxes.height
             old_scroll_y = self.scroller.scroll_y
 
-            row_widget = self.row_lookup[i].row_widget
-            self.boxes.remove_widget(row_widget)
-            self._update_boxes_height()
+            if i in self.row_views:
+                self._release_row_view(i)
 
-            del self.row_lookup[i]
-            self.row_ordering.remove(i)
-
-            if self.active_row_id_before_pause[0] == i:
-                self.active_row_id_before_pause[0] = -1
-                self.update_pause_btn(mode='pause', disabled=True)
-
-            if self.active_row_id == i:
-                self.active_row_id = -1
-                self.update_row_colors(self.active_row_id)
-                self.update_pause_btn(mode='pause', disabled=True)
+            self.engine.remove_row(i)
+            self._update_boxes_height()
+            self.update_pause_btn()
 
             new_boxes_height = self.boxes.height
             if 0 < self.scroller.scroll_y < 1:
@@ -709,38 +1242,30 @@ class Boxes(FloatLayout):
 
             if simulate_hover_evt:
                 # highlight the new button that ends up underneath the mouse
-                all_rm_btns = [data.remove_btn for data in self.row_lookup.values()]
-                Clock.schedule_once(lambda _: self.simulate_mouse_hover_after_layout_change(all_rm_btns))
+                Clock.schedule_once(lambda _: self.simulate_mouse_hover_after_layout_change())
 
             self.update_title_img_color()
-            self._update_row_hint_texts()
+            self._refresh_visible_rows()
 
     def clear_row_time(self, i):
         if i in self.row_lookup:
-            self.row_lookup[i].set_time_ms(0)
-
-            if i == self.active_row_id:
-                self.row_lookup[i].timer_btn.state = "normal"
-                self.active_row_id = -1
-                self.update_pause_btn(mode='pause', disabled=True)
-            elif i == self.active_row_id_before_pause[0]:
-                self.active_row_id_before_pause[0] = -1
-                self.update_pause_btn(mode='pause', disabled=True)
-
-            self.update_row_colors(i)
+            self.engine.reset(i)
+            self._on_rows_changed(i)
 
     def update_row_colors(self, i):
-        if i in self.row_lookup:
-            self.row_lookup[i].update_colors()
+        if i in self.row_views:
+            self.row_views[i].update_colors()
 
     def update_title_img_color(self):
         self.title_img.color = FG_COLOR if self.active_row_id >= 0 else FG_COLOR_DIM
 
+    @profiled()
     def update_all_colors(self):
         self.update_title_img_color()
-        for i in self.row_lookup:
-            self.row_lookup[i].update_colors()
+        for view in self.row_views.values():
+            view.update_colors()
         self.pause_btn.update_colors()
+        self.report_btn.update_colors()
         self.add_btn.update_colors()
 
     def _make_text_input(self, hint_text="") -> MyTextInput:
@@ -760,9 +1285,26 @@ class Boxes(FloatLayout):
 
     def select_text_field(self, i, cursor_col=0):
         if i in self.row_lookup:
-            row_to_focus = self.row_lookup[i]
-            row_to_focus.textbox.focus = True
-            row_to_focus.textbox.cursor = (cursor_col, 0)
+            self.scroll_to_row(i)
+            view = self.row_views.get(i)
+            if view is not None:
+                view.textbox.focus = True
+                view.textbox.cursor = (cursor_col, 0)
+
+    def scroll_to_row(self, i):
+        """Scrolls the list just far enough for the given row to be fully visible (and bound to a view)."""
+        if i in self.row_lookup:
+            overflow = self.boxes.height - self.scroller.height
+            if overflow > 0:
+                row_top = self.row_ordering.index(i) * sp(ROW_HEIGHT + SPACING)
+                row_bottom = row_top + sp(ROW_HEIGHT)
+                top_offset = (1 - self.scroller.scroll_y) * overflow
+                if row_top < top_offset:
+                    top_offset = row_top
+                elif row_bottom > top_offset + self.scroller.height:
+                    top_offset = row_bottom - self.scroller.height
+                self.scroller.scroll_y = min(1, max(0, 1 - top_offset / overflow))
+            self._refresh_visible_rows()
 
     def move_focused_text_field(self, cur_i, dy, cursor_col=0):
         if cur_i in self.row_lookup and len(self.row_lookup) > 1:
@@ -771,51 +1313,43 @@ class Boxes(FloatLayout):
             self.select_text_field(next_i, cursor_col=cursor_col)
 
     def _cache_cursor_pos(self, i):
-        if i in self.row_lookup:
-            row = self.row_lookup[i]
-            self._cached_cursor_col = row.textbox.cursor_col
+        if i in self.row_views:
+            self._cached_cursor_col = self.row_views[i].textbox.cursor_col
 
     def stop_active_timer(self):
         if self.active_row_id >= 0:
             row_id = self.active_row_id
-            if self.active_row_id in self.row_lookup:
-                self.row_lookup[self.active_row_id].timer_btn.state = 'normal'
-            self.active_row_id = -1
-            self.update_row_colors(row_id)
-            self.update_title_img_color()
-            self.update_pause_btn(mode='pause', disabled=True)
+            self.engine.stop()
+            self._on_rows_changed(row_id)
+
+    def add_default_rows(self, n=NUM_DEFAULT_ROWS):
+        for _ in range(n):
+            self.add_row()
 
     def add_row(self):
-        i = self.activity_id_counter
-        self.activity_id_counter += 1
+        row_data = self.engine.add_row()
+        self._update_boxes_height()
+        self._trigger_refresh()
+
+        return row_data.row_id, row_data
 
+    def _build_row_view(self) -> RowView:
+        # the callbacks below look up `view.row_id` when they fire, because views get recycled between rows
         row_height = f'{ROW_HEIGHT}sp'
         row = BoxLayout(orientation='horizontal', height=row_height, size_hint=(1, None))
-        row.spacing = self.boxes.spacing
+        row.spacing = f'{SPACING}sp'
 
-        timer_btn = MyToggleButton(size=(f'{ROW_HEIGHT * 4}sp', row_height), size_hint=(None, None))
+        timer_btn = TimerToggleButton(size=(f'{ROW_HEIGHT * 4}sp', row_height), size_hint=(None, None))
         timer_btn.group = self._btn_group
         timer_btn.text = ZERO_TIME
 
         def on_timer_btn_press(btn):
-            rows_to_update = set()
-            if self.active_row_id_before_pause[0] >= 0:
-                rows_to_update.add(self.active_row_id_before_pause[0])
-                self.active_row_id_before_pause[0] = -1
-
+            rows_to_update = (view.row_id, self.active_row_id, self.paused_row_id)
             if btn.state == "down":
-                rows_to_update.add(self.active_row_id)
-                self.active_row_id = i
-                self.update_pause_btn(mode='pause', disabled=False)
+                self.engine.start(view.row_id)
             else:
-                self.active_row_id = -1
-                self.update_pause_btn(mode='pause', disabled=True)
-
-            rows_to_update.add(i)
-
-            for row_id in rows_to_update:
-                self.update_row_colors(row_id)
-            self.update_title_img_color()
+                self.engine.stop()
+            self._on_rows_changed(*rows_to_update)
 
         timer_btn.bind(on_press=on_timer_btn_press)
 
@@ -833,7 +1367,7 @@ class Boxes(FloatLayout):
         def calc_timer_bg_color():
             if timer_btn.state == 'down':
                 return FG_COLOR if not timer_btn.disabled else FG_COLOR_DIM
-            elif self.active_row_id_before_pause[0] == i:
+            elif self.paused_row_id == view.row_id:
                 return FG_COLOR_DIM
             else:
                 return BG_COLOR
@@ -842,7 +1376,13 @@ class Boxes(FloatLayout):
         row.add_widget(timer_btn)
 
         textinput = self._make_text_input()
-        textinput.hint_text = NEW_ACTIVITY_TEXT.format(f'{len(self.row_ordering) + 1}')
+
+        def on_text_changed(_, text):
+            self.engine.rename_row(view.row_id, text)
+        textinput.bind(text=on_text_changed)
+
+        # a view that was kept alive offscreen because it had focus can be recycled once it loses it
+        textinput.bind(focus=lambda *_: self._trigger_refresh())
 
         def on_triple_tap(txt_fld):
             Clock.schedule_once(lambda dt: txt_fld.select_all())
@@ -854,21 +1394,21 @@ class Boxes(FloatLayout):
         def kb_on_key_down(window, keycode, text, modifiers):
             if keycode is not None and keycode[1] in ('up', 'down'):
                 cursor_col = textinput.cursor_col
-                self.move_focused_text_field(i, (1 if keycode[1] == 'down' else -1), max(cursor_col, self._cached_cursor_col))
+                self.move_focused_text_field(view.row_id, (1 if keycode[1] == 'down' else -1), max(cursor_col, self._cached_cursor_col))
                 return True
             elif keycode is not None and keycode[1] in ('left', 'right', 'home', 'end', 'pageup', 'pagedown'):
-                Clock.schedule_once(lambda dt: self._cache_cursor_pos(i))
+                Clock.schedule_once(lambda dt, _i=view.row_id: self._cache_cursor_pos(_i))
             return old_kb_on_key_down(window, keycode, text, modifiers)
 
         textinput.keyboard_on_key_down = kb_on_key_down
 
         def store_cursor_pos_later(*_):
-            Clock.schedule_once(lambda dt: self._cache_cursor_pos(i))
+            Clock.schedule_once(lambda dt, _i=view.row_id: self._cache_cursor_pos(_i))
         textinput.bind(text=store_cursor_pos_later)
 
         def store_cursor_col_later_wrapper(func):
             def wrapper(*args, **kwargs):
-                Clock.schedule_once(lambda dt: self._cache_cursor_pos(i))
+                Clock.schedule_once(lambda dt, _i=view.row_id: self._cache_cursor_pos(_i))
                 func(*args, **kwargs)
             return wrapper
 
@@ -878,9 +1418,9 @@ class Boxes(FloatLayout):
         def calc_border_color():
             if textinput.focused:
                 return SECONDARY_COLOR
-            elif i == self.active_row_id:
+            elif view.row_id == self.active_row_id:
                 return FG_COLOR
-            elif i == self.active_row_id_before_pause[0]:
+            elif view.row_id == self.paused_row_id:
                 return FG_COLOR_DIM
             else:
                 return DISABLED_FG_COLOR
@@ -891,13 +1431,13 @@ class Boxes(FloatLayout):
         reset_btn = MyButton(size=(f"{ROW_HEIGHT * 2}sp", row_height), size_hint=(None, None))
         reset_btn.text = RESET_TEXT
         reset_btn.font_size = f'{REGULAR_FONT_SIZE}sp'
-        reset_btn.on_release = lambda: self.clear_row_time(i)
+        reset_btn.on_release = lambda: self.clear_row_time(view.row_id)
 
         def calc_reset_btn_color(for_text):
-            base_line_color = FG_COLOR if self.active_row_id == i else \
-                (FG_COLOR_DIM if self.active_row_id_before_pause[0] == i else DISABLED_FG_COLOR)
+            base_line_color = FG_COLOR if self.active_row_id == view.row_id else \
+                (FG_COLOR_DIM if self.paused_row_id == view.row_id else DISABLED_FG_COLOR)
             if timer_btn.text in ('', ZERO_TIME) and \
-                    i not in (self.active_row_id, self.active_row_id_before_pause[0]):
+                    view.row_id not in (self.active_row_id, self.paused_row_id):
                 return DISABLED_FG_COLOR if for_text else base_line_color
             elif reset_btn.hovering:
                 return FG_COLOR
@@ -911,18 +1451,18 @@ class Boxes(FloatLayout):
         edit_btn = MyButton(size=(f"{ROW_HEIGHT * 2}sp", row_height), size_hint=(None, None))
         edit_btn.text = EDIT_TEXT
         edit_btn.font_size = f'{REGULAR_FONT_SIZE}sp'
-        edit_btn.bind(on_release=lambda _: self.create_edit_popup(i))
-        edit_btn.bind(on_press=lambda _: self.start_dragging_edit_button(i))
+        edit_btn.bind(on_release=lambda _: self.create_edit_popup(view.row_id))
+        edit_btn.bind(on_press=lambda _: self.start_dragging_edit_button(view.row_id))
 
         def calc_edit_btn_colors(for_text):
-            base_line_color = FG_COLOR if self.active_row_id == i else \
-                (FG_COLOR_DIM if self.active_row_id_before_pause[0] == i else DISABLED_FG_COLOR)
+            base_line_color = FG_COLOR if self.active_row_id == view.row_id else \
+                (FG_COLOR_DIM if self.paused_row_id == view.row_id else DISABLED_FG_COLOR)
             if self.dragging_edit_btn_row < 0:
                 if for_text:
                     return FG_COLOR if edit_btn.hovering else SECONDARY_COLOR
                 else:
                     return FG_COLOR if edit_btn.hovering else base_line_color
-            elif i == self.dragging_edit_btn_row:
+            elif view.row_id == self.dragging_edit_btn_row:
                 return FG_COLOR if edit_btn.hovering else ACCENT_COLOR
             elif edit_btn.hovering:
                 return ACCENT_COLOR
@@ -937,8 +1477,8 @@ class Boxes(FloatLayout):
             if for_text:
                 return (hover_color or FG_COLOR) if btn.hovering else SECONDARY_COLOR
             else:
-                base_line_color = FG_COLOR if self.active_row_id == i else \
-                    (FG_COLOR_DIM if self.active_row_id_before_pause[0] == i else DISABLED_FG_COLOR)
+                base_line_color = FG_COLOR if self.active_row_id == view.row_id else \
+                    (FG_COLOR_DIM if self.paused_row_id == view.row_id else DISABLED_FG_COLOR)
                 return (hover_color or FG_COLOR) if btn.hovering else base_line_color
 
         drag_btn = MyButton(size=(row_height, row_height), size_hint=(None, None))
@@ -947,38 +1487,26 @@ class Boxes(FloatLayout):
         drag_btn.hover_cursor = 'size_ns'
         drag_btn.calc_line_color = lambda: get_basic_btn_color(drag_btn, False)
         drag_btn.calc_text_color = lambda: get_basic_btn_color(drag_btn, True)
-        drag_btn.bind(on_touch_down=lambda btn, me: drag_btn.collide_point(*me.pos) and self.start_dragging_row(i, me))
+        drag_btn.bind(on_touch_down=lambda btn, me: drag_btn.collide_point(*me.pos) and self.start_dragging_row(view.row_id, me))
         row.add_widget(drag_btn)
 
         remove_btn = MyButton(size=(row_height, row_height), size_hint=(None, None))
         remove_btn.text = REMOVE_SYMBOL_TEXT
         remove_btn.font_size = f'{REGULAR_FONT_SIZE}sp'
-        remove_btn.on_release = lambda: self.remove_row(i, simulate_hover_evt=True)
+        remove_btn.on_release = lambda: self.remove_row(view.row_id, simulate_hover_evt=True)
         remove_btn.calc_line_color = lambda: get_basic_btn_color(remove_btn, False, hover_color=CANCEL_COLOR)
         remove_btn.calc_text_color = lambda: get_basic_btn_color(remove_btn, True, hover_color=CANCEL_COLOR)
 
         row.add_widget(remove_btn)
 
-        self.boxes.add_widget(row)
-        self._update_boxes_height()
-
-        row_data = RowData(row, timer_btn, textinput, edit_btn, remove_btn)
-        self.row_lookup[i] = row_data
-        self.row_ordering.append(i)
-
-        self.update_row_colors(i)
-
-        return i, row_data
+        view = RowView(row, timer_btn, textinput, edit_btn, remove_btn)
+        return view  # (the callbacks above close over this)
 
     def create_edit_popup(self, i, from_row_id=None):
         if i not in self.row_lookup:
             return
         dest_row = self.row_lookup[i]
-
-        if from_row_id is not None and from_row_id in self.row_lookup:
-            from_row = self.row_lookup[from_row_id]
-        else:
-            from_row = None
+        from_row = self.get_row_data(from_row_id) if from_row_id is not None else None
 
         edit_field = self._make_text_input(PLUS_MINUS_MINUTES_TEXT)
         ok_btn = MyButton(text=OK_TEXT, font_size=f'{REGULAR_FONT_SIZE}sp')
@@ -1011,9 +1539,9 @@ class Boxes(FloatLayout):
         global_popup_var.append(popup)
 
         if from_row is None:
-            title_text = EDIT_ACTIVITY_TEXT.format(f"{dest_row.textbox.text or UNTITLED_ACTIVITY_TEXT}")
+            title_text = EDIT_ACTIVITY_TEXT.format(f"{dest_row.text or UNTITLED_ACTIVITY_TEXT}")
         else:
-            title_text = TRANSFER_TIME_TEXT.format(f"{dest_row.textbox.text or UNTITLED_ACTIVITY_TEXT}")
+            title_text = TRANSFER_TIME_TEXT.format(f"{dest_row.text or UNTITLED_ACTIVITY_TEXT}")
 
         if len(title_text) > 30:
             title_text = title_text[:27] + "..."
@@ -1035,10 +1563,11 @@ class Boxes(FloatLayout):
                     # If you type "all", transfer everything
                     ms_to_add = from_row.get_time_ms() if from_row is not None else 0
                 else:
-                    minutes_to_add = safe_eval_time_string(cur_text)
+                    minutes_to_add = eval_time_expr(cur_text)
                     ms_to_add = int(1000 * 60 * minutes_to_add)
 
-                self._transfer_time_between_rows(ms_to_add, dest_row, from_row)
+                self._transfer_time_between_rows(ms_to_add, dest_row.row_id,
+                                                 from_row.row_id if from_row is not None else None)
 
             except Exception:
                 traceback.print_exc()
@@ -1055,31 +1584,27 @@ class Boxes(FloatLayout):
         edit_field.focus = True
         edit_field.in_popup = True
 
-        popup.bind(on_dismiss=lambda _: global_popup_var.clear())
+        def on_dismiss(_):
+            global_popup_var.clear()
+            hover_dispatcher.unregister_tree(content)
+        popup.bind(on_dismiss=on_dismiss)
         popup.open()
 
-    def _transfer_time_between_rows(self, ms_to_add, dest_row: RowData, from_row: RowData=None):
-        if isinstance(from_row, int):
-            from_row = self.get_row_data(from_row)
-        if from_row is not None:
-            new_from_time = max(0, from_row.get_time_ms() - ms_to_add)
-            from_row.set_time_ms(new_from_time)
-            if new_from_time == 0 and self.is_active(from_row):
-                self.stop_active_timer()
-
-        if isinstance(dest_row, int):
-            dest_row = self.get_row_data(dest_row)
-        new_dest_time = max(0, dest_row.get_time_ms() + ms_to_add)
-        dest_row.set_time_ms(new_dest_time)
-        if new_dest_time == 0 and self.is_active(dest_row):
-            self.stop_active_timer()
+    def _transfer_time_between_rows(self, ms_to_add, dest_row_id, from_row_id=None):
+        active_row_id = self.active_row_id
+        self.engine.transfer(ms_to_add, dest_row_id, from_row_id)
+        self._on_rows_changed(dest_row_id, from_row_id, active_row_id)
 
     def is_active(self, row: RowData):
-        return self.active_row_id in self.row_lookup and self.row_lookup[self.active_row_id] is row
-
-    def update_pause_btn(self, mode='pause', disabled=False):
-        self.pause_btn.disabled = disabled
-        self.pause_btn.text = PAUSE_TEXT if mode == 'pause' else RESUME_TEXT
+        return self.engine.is_active(row)
+
+    def update_pause_btn(self):
+        """Matches the pause button to the engine: it's held down while paused, and disabled while
+        there's nothing to pause or resume."""
+        paused = self.active_row_id < 0 and self.paused_row_id >= 0
+        self.pause_btn.state = 'down' if paused else 'normal'
+        self.pause_btn.disabled = self.active_row_id < 0 and not paused
+        self.pause_btn.text = RESUME_TEXT if paused else PAUSE_TEXT
         self.pause_btn.update_colors()
 
     def _build_pause_btn(self):
@@ -1103,105 +1628,225 @@ class Boxes(FloatLayout):
         self.pause_btn.calc_line_color = lambda: calc_pause_btn_color(False)
 
         def on_btn_press(btn):
-            rows_to_update = []
+            rows_to_update = (self.active_row_id, self.paused_row_id)
             if btn.state == "down":
-                self.active_row_id_before_pause[0] = self.active_row_id
-                btn.text = RESUME_TEXT
-                self.active_row_id = -1
-                rows_to_update.append(self.active_row_id_before_pause[0])
+                self.engine.pause()
             else:
-                if self.active_row_id_before_pause[0] in self.row_lookup:
-                    self.active_row_id = self.active_row_id_before_pause[0]
-                    self.row_lookup[self.active_row_id_before_pause[0]].timer_btn.state = "down"
-                    rows_to_update.append(self.active_row_id_before_pause[0])
-                btn.text = PAUSE_TEXT
-                self.active_row_id_before_pause[0] = -1
-
-            btn.update_colors()
-            for row_id in rows_to_update:
-                self.update_row_colors(row_id)
-            self.update_title_img_color()
+                self.engine.resume()
+            self._on_rows_changed(*rows_to_update)
 
         self.pause_btn.bind(on_press=on_btn_press)
-        self.update_pause_btn(mode='pause', disabled=True)
+        self.update_pause_btn()
 
     def _build_add_btn(self):
         self.add_btn.calc_text_color = lambda: FG_COLOR if self.add_btn.hovering else SECONDARY_COLOR
         self.add_btn.calc_line_color = lambda: FG_COLOR if self.add_btn.hovering else DISABLED_FG_COLOR
+        self.report_btn.calc_text_color = lambda: FG_COLOR if self.report_btn.hovering else SECONDARY_COLOR
+        self.report_btn.calc_line_color = lambda: FG_COLOR if self.report_btn.hovering else DISABLED_FG_COLOR
+
+    def get_report_index(self) -> ReportIndex:
+        # kept around between reports, so only the intervals recorded since the last one need indexing
+        if self.report_index is None or self.report_index.history is not self.engine.history:
+            self.report_index = ReportIndex(self.engine.history, self.engine.get_open_interval)
+        return self.report_index
+
+    def create_report_popup(self):
+        names = {row_id: row.text for row_id, row in self.row_lookup.items()}
+        report_lbl = Label(text=format_summary(self.get_report_index(), names, ordering=self.engine.row_ordering),
+                           color=SECONDARY_COLOR, size_hint=(None, None), halign='left', valign='top')
+        report_lbl.bind(texture_size=report_lbl.setter('size'))
+
+        report_scroller = ScrollView(effect_cls='ScrollEffect', scroll_type=['bars'], bar_width=4)
+        report_scroller.add_widget(report_lbl)
+
+        close_btn = MyButton(text=CLOSE_TEXT, font_size=f'{REGULAR_FONT_SIZE}sp')
+        close_btn.calc_text_color = lambda: FG_COLOR if close_btn.hovering else SECONDARY_COLOR
+        close_btn.calc_line_color = lambda: FG_COLOR if close_btn.hovering else DISABLED_FG_COLOR
+        close_btn.in_popup = True
+
+        content = BoxLayout(orientation='vertical')
+        content.spacing = 4
+        content.add_widget(report_scroller)
+
+        btn_row = BoxLayout(orientation='horizontal')
+        btn_row.size_hint = (1, None)
+        btn_row.height = f'{ROW_HEIGHT}sp'
+        btn_row.add_widget(Widget())
+        btn_row.add_widget(close_btn)
+        btn_row.add_widget(Widget())
+        content.add_widget(btn_row)
+
+        popup = Popup(content=content, auto_dismiss=True)
+        global_popup_var.append(popup)
+
+        popup.title = REPORT_TITLE_TEXT
+        popup.title_align = 'center'
+        popup.title_font = REGULAR_FONT
+        popup.title_size = REGULAR_FONT_SIZE
+        popup.separator_color = FG_COLOR
+        popup.size_hint = (None, None)
+        popup.size = ('640sp', '400sp')
+
+        close_btn.bind(on_press=popup.dismiss)
+
+        def on_dismiss(_):
+            global_popup_var.clear()
+            hover_dispatcher.unregister_tree(content)
+        popup.bind(on_dismiss=on_dismiss)
+        popup.open()
+
+    def import_file(self, filepath):
+        """Imports history from another tracker's export on a background thread, showing its progress in a popup."""
+        if self.importer is not None:
+            print(f"INFO: Already importing {self.importer.filepath}, ignoring {filepath}")
+            return
+        status_lbl = Label(text=IMPORT_PROGRESS_TEXT.format(0), color=SECONDARY_COLOR, halign='center')
+
+        popup = Popup(content=status_lbl, auto_dismiss=False)
+        global_popup_var.append(popup)
+
+        title_text = IMPORT_TITLE_TEXT.format(os.path.basename(filepath))
+        if len(title_text) > 30:
+            title_text = title_text[:27] + "..."
+        popup.title = title_text
+        popup.title_align = 'center'
+        popup.title_font = REGULAR_FONT
+        popup.title_size = REGULAR_FONT_SIZE
+        popup.separator_color = FG_COLOR
+        popup.size_hint = (None, None)
+        popup.size = ('400sp', '168sp')
+        popup.bind(on_dismiss=lambda _: global_popup_var.clear())
+
+        def on_progress(fraction):
+            status_lbl.text = IMPORT_PROGRESS_TEXT.format(int(fraction * 100)) if fraction < 1 else IMPORT_MERGING_TEXT
+
+        def on_done(result):
+            self.importer = None
+            try:
+                if result is None:
+                    status_lbl.text = IMPORT_FAILED_TEXT
+                else:
+                    status_lbl.text = IMPORT_DONE_TEXT.format(result.num_rows - result.num_skipped, len(result.names),
+                                                              result.num_skipped, format_time_ms(result.trimmed_ms))
+                popup.auto_dismiss = True
+            finally:
+                # (even a failed import may have added rows already)
+                self._on_bulk_load()
+
+        autosave_filepath = self.get_default_autosave_filepath()
+        self.importer = Importer(self.engine, filepath, run_on_ui=lambda func: Clock.schedule_once(lambda dt: func()),
+                                 history_filepath=history_path(autosave_filepath) if autosave_filepath else None,
+                                 progress=on_progress, on_done=on_done)
+        self.importer.start()
+        popup.open()
 
     def get_default_autosave_filepath(self, and_create=True):
-        if AUTO_SAVE_DIR is not None:
-            if and_create:
-                os.makedirs(AUTO_SAVE_DIR, exist_ok=True)
-            return os.path.join(AUTO_SAVE_DIR, "autosave.json")
-        else:
-            return None
+        return get_default_autosave_filepath(and_create) if DO_AUTOSAVES else None
 
-    def save_to_disk(self, filepath='default'):
+    @profiled()
+    def save_to_disk(self, filepath='default', wait_secs=None):
+        """Snapshots the state and writes it on a background thread. If `wait_secs` is given, blocks until
+        the write is done (or until that many seconds have passed)."""
         try:
             if filepath == 'default':
-                filepath = self.get_default_autosave_filepath()
+                filepath = self.get_default_autosave_filepath() if not self.autosave_blocked else None
             if filepath is not None:
-                blob = self.to_json()
-                with open(filepath, 'w') as fp:
-                    json.dump(blob, fp)
+                if self.autosave_writer is None:
+                    self.autosave_writer = AutosaveWriter()
+                if self.journal is not None and filepath == self.journal.snapshot_path:
+                    # the snapshot will contain everything journaled so far
+                    self.journal.start_new_generation()
+                self.autosave_writer.request_save(filepath, self.to_json())
+                if self.journal is not None:
+                    self.journal.sync()
+                if wait_secs is not None and not self.autosave_writer.flush(timeout=wait_secs):
+                    print(f"ERROR: timed out after {wait_secs}s waiting to autosave to {filepath}")
         except Exception:
             print(f"ERROR: failed to autosave to {filepath}")
             traceback.print_exc()
 
     def load_from_disk(self, filepath='default'):
+        """Returns whether the file was loaded. If the default autosave can't be read, it's moved aside (or,
+        failing that, autosaving is turned off), so that starting afresh doesn't overwrite it."""
+        is_autosave = filepath == 'default'
         try:
-            if filepath == 'default':
+            if is_autosave:
                 filepath = self.get_default_autosave_filepath()
             if filepath is not None and os.path.exists(filepath):
-                with open(filepath, 'r') as fp:
-                    blob = json.load(fp)
+                # replays any journaled changes on top of the snapshot
+                blob = load_state(filepath)
                 self.from_json(blob)
                 print(f"INFO: Loaded autosave data from {filepath}")
+                return True
             else:
                 print("INFO: No autosave file found (fresh launch)")
+                return False
         except Exception:
             print(f"ERROR: failed to load autosave data from {filepath}")
             traceback.print_exc()
+        if not is_autosave:
+            return False  # (someone else's file, leave it be)
 
-    def to_json(self):
-        ordering = list(self.row_ordering)
-        if self.floating_row >= 0 and -2 in ordering:
-            # XXX If we're currently dragging a row, the ordering list will have -2
-            # at that row's index as a placeholder. So swap it out~
-            ordering[ordering.index(-2)] = self.floating_row
-
-        return {
-            'version': '1.0',
-            'timestamp_ms': int(time.time() * 1000),
-            'active_row_id': self.active_row_id,
-            'row_lookup': {str(row_id): self.row_lookup[row_id].to_json() for row_id in self.row_lookup},
-            'row_ordering': ordering
-        }
+        try:
+            backup_path = back_up_unreadable_autosave(filepath)
+            print(f"ERROR: moved the unreadable autosave to {backup_path}, starting afresh")
+        except Exception:
+            self.autosave_blocked = True
+            print(f"ERROR: failed to move {filepath} aside, not autosaving so as not to overwrite it")
+            traceback.print_exc()
+        return False
 
-    def from_json(self, blob):
-        for row_id in list(self.row_lookup.keys()):
-            self.remove_row(row_id)
+    def open_history(self):
+        """Loads the interval history that sits next to the autosave file, and appends new intervals to it."""
+        try:
+            filepath = self.get_default_autosave_filepath()
+            if filepath is not None:
+                history = IntervalStore.load(history_path(filepath))
+                history.attach(history_path(filepath))
+                self.engine.set_history(history)
+                print(f"INFO: Loaded {len(history)} intervals of history")
+        except Exception:
+            print("ERROR: failed to load the interval history")
+            traceback.print_exc()
+
+    def start_journal(self):
+        """Checkpoints the current state to the autosave file, and journals every change made on top of it."""
+        try:
+            filepath = self.get_default_autosave_filepath() if not self.autosave_blocked else None
+            if filepath is not None:
+                if self.autosave_writer is None:
+                    self.autosave_writer = AutosaveWriter()
+                self.engine.journal = Journal(filepath, next_journal_generation(filepath), self.autosave_writer)
+                write_snapshot(filepath, self.to_json())
+        except Exception:
+            print("ERROR: failed to start the autosave journal, falling back to periodic autosaves")
+            traceback.print_exc()
+            self.engine.journal = None
 
-        time_since_save = int(time.time() * 1000) - int(blob['timestamp_ms'])
-        pause_btn_enabled = False
+    def to_json(self):
+        return self.engine.to_json()
 
-        for old_row_id in blob['row_ordering']:
-            if str(old_row_id) in blob['row_lookup']:
-                row_blob = blob['row_lookup'][str(old_row_id)]
-                row_id, new_row = self.add_row()
-                new_row.from_json(row_blob)
+    def from_json(self, blob):
+        self.engine.from_json(blob)
+        self._on_bulk_load()
 
-                if old_row_id == blob['active_row_id']:
-                    self.active_row_id = row_id
-                    new_row.add_time_ms(time_since_save)
-                    new_row.timer_btn.state = "down"
-                    pause_btn_enabled = True
+    def bulk_load(self, rows: typing.List[RowData], active_row_id=-1):
+        """Replaces all the rows at once, in the given order. Unlike adding & removing rows one by one,
+        this does the layout, hint text and color passes just once at the end."""
+        self.engine.bulk_load(rows, active_row_id=active_row_id)
+        self._on_bulk_load()
 
-                new_row.update_timer_btn_label()
+    def _on_bulk_load(self):
+        for row_id in list(self.row_views.keys()):
+            self._release_row_view(row_id)
 
-        self.update_pause_btn(mode='pause', disabled=not pause_btn_enabled)
+        self.update_pause_btn()
+        self._update_boxes_height()
+        self.scroller.scroll_y = 1
+        self._refresh_visible_rows()
         self.update_all_colors()
+        self.schedule_next_tick()
+
 
 class TimeTrackerApp(App):
 
@@ -1211,14 +1856,25 @@ class TimeTrackerApp(App):
     def build(self):
         self.title = WINDOW_TITLE
         self.icon = 'resources/icons/icon64.png'
-        res = Boxes(self)
+        # if there's an autosave, it'll replace the default rows anyways
+        res = Boxes(self, num_default_rows=0 if DO_AUTOSAVES else NUM_DEFAULT_ROWS)
 
         if DO_AUTOSAVES:
+            res.open_history()
             # load most recent autosave if it exists
-            res.load_from_disk()
+            if not res.load_from_disk():
+                res.add_default_rows()
+            res.start_journal()
 
+        if profiling.ENABLED:
+            profiling.profiler.start(Clock, Window, show_overlay=profiling.SHOW_OVERLAY,
+                                     dump_filepath=profiling.get_dump_filepath() if profiling.DUMP_STATS else None)
         return res
 
+    def on_stop(self):
+        if profiling.DUMP_STATS:
+            profiling.profiler.dump(profiling.get_dump_filepath())
+
 
 def hsv_to_rgb(h, s, v):
     # from https://stackoverflow.com/a/26856771
@@ -1237,20 +1893,67 @@ def hsv_to_rgb(h, s, v):
     if i == 5: return (v, p, q)
 
 
+class RainbowTable:
+    """The (quantized) foreground colors for each step of the rainbow cycle, along with how many steps
+    until the color visibly changes, so looking one up tells you when to look again too."""
+
+    MS_PER_DAY = 24 * 60 * 60 * 1000
+
+    def __init__(self, period_hours=RAINBOW_PERIOD_HOURS, hue_offset=RAINBOW_HUE_OFFSET, steps=RAINBOW_STEPS):
+        self.key = (period_hours, hue_offset, steps)
+        self.ms_per_period = period_hours * 60 * 60 * 1000
+        if self.ms_per_period <= 0:
+            steps = 1
+        self.ms_per_step = self.ms_per_period / steps
+
+        self.fg_colors = []
+        self.dim_colors = []
+        for i in range(steps):
+            fg = quantize_color(hsv_to_rgb(360 * i / steps + hue_offset, 0.666, 1))
+            if len(self.fg_colors) > 0 and fg == self.fg_colors[-1]:
+                # (reusing the same tuples, so unchanged colors can be spotted with `is`)
+                self.fg_colors.append(self.fg_colors[-1])
+                self.dim_colors.append(self.dim_colors[-1])
+            else:
+                self.fg_colors.append(fg)
+                self.dim_colors.append(tuple(x * 0.333 for x in fg))
+
+        # steps_until_change[i] = how many steps after i the color is first different (counting up to the
+        # end of the cycle, where it wraps around and gets looked up again anyways)
+        self.steps_until_change = [1] * steps
+        for i in range(steps - 2, -1, -1):
+            if self.fg_colors[i + 1] is self.fg_colors[i]:
+                self.steps_until_change[i] = self.steps_until_change[i + 1] + 1
+
+    def lookup(self, t_ms):
+        """Returns `(fg_color, dim_color, next_change_ms)` for the given time."""
+        if self.ms_per_period <= 0:
+            return self.fg_colors[0], self.dim_colors[0], float('inf')
+        time_of_day = t_ms % self.MS_PER_DAY
+        t_in_period = time_of_day % self.ms_per_period
+        i = int(t_in_period // self.ms_per_step)
+        next_change_ms = t_ms - t_in_period + math.ceil((i + self.steps_until_change[i]) * self.ms_per_step)
+        # the cycle restarts at midnight too, if the period doesn't divide the day evenly
+        next_change_ms = min(next_change_ms, t_ms - time_of_day + self.MS_PER_DAY)
+        return self.fg_colors[i], self.dim_colors[i], next_change_ms
+
+
+_rainbow_table: typing.Optional[RainbowTable] = None
+
+
+def get_rainbow_table() -> RainbowTable:
+    global _rainbow_table
+    if _rainbow_table is None or _rainbow_table.key != (RAINBOW_PERIOD_HOURS, RAINBOW_HUE_OFFSET, RAINBOW_STEPS):
+        _rainbow_table = RainbowTable()
+    return _rainbow_table
+
+
 def get_color_for_time(t_ms=None):
-    if RAINBOW_PERIOD_HOURS <= 0:
-        h = RAINBOW_HUE_OFFSET
-    else:
-        if t_ms is None:
-            t_ms = int(time.time() * 1000)
-        time_of_day = t_ms % (24 * 60 * 60 * 1000)
-        ms_per_period = RAINBOW_PERIOD_HOURS * 60 * 60 * 1000
-        h = 360 * (time_of_day % ms_per_period) / ms_per_period + RAINBOW_HUE_OFFSET
-    hsv = (h, 0.666, 1)
-    rgb = hsv_to_rgb(*hsv)
-    return rgb
+    if t_ms is None:
+        t_ms = get_time_ms()
+    return get_rainbow_table().lookup(t_ms)[0]
 
 
 if __name__ == '__main__':
-    set_fg_color(get_color_for_time())
+    color_engine.update_for_time()
     TimeTrackerApp().run()